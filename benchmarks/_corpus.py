@@ -0,0 +1,21 @@
+SAMPLE = """\
+type Point(x: Number, y: Number) {
+    x = x;
+    y = y;
+    norm(): Number => sqrt(self.x ^ 2 + self.y ** 2);
+}
+
+function fib(n: Number): Number => if (n <= 1) n else fib(n - 1) + fib(n - 2);
+
+// a comment with "quotes" and symbols: !@#$%
+let p = new Point(3, 4), s = "hi \\"there\\"" in {
+\tprint(p.norm() @ " " @@ s);
+\tprint(PI >= E & !false | true);
+};
+"""
+
+
+def hulk_source(size: int) -> str:
+    """Returns a HULK program of exactly `size` characters."""
+    copies = size // len(SAMPLE) + 1
+    return (SAMPLE * copies)[:size]
@@ -0,0 +1,82 @@
+"""
+Cold build time of the HULK lexer automaton, split in its subset
+constructions: compiling every regex of the token table (`nfa_to_dfa`, then
+minimization) and determinizing their union (`State.to_deterministic`).
+Both constructions are also timed on `(a|b)*a(a|b)...(a|b)`, whose DFA doubles in size with
+every `(a|b)`, to show how they scale with the number of DFA states.
+
+Run from the repository root with:
+
+    python -m benchmarks.dfa_build [REPEAT]
+
+Everything is built from scratch, bypassing the on-disk cache, and the best
+of `REPEAT` runs (3 by default) is reported.
+"""
+
+import sys
+import time
+
+from bruce import token_table
+from bruce.grammar import GRAMMAR
+from bruce.tools.lexer import Lexer
+from bruce.tools.parser import evaluate_parse
+from bruce.tools.regex import GRAMMAR as REGEX_GRAMMAR
+from bruce.tools.regex import Regex, get_parser, regex_tokenizer, symbol
+from bruce.tools.regex.automata import State, nfa_to_dfa
+
+
+SYNTHETIC_SIZES = [6, 8, 10]
+
+
+def best_of(repeat, build):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = build()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def compile(pattern):
+    regex = Regex(pattern)
+    regex.automaton
+    return regex
+
+
+def nfa(pattern):
+    tokens = regex_tokenizer(pattern, REGEX_GRAMMAR, symbol)
+    return evaluate_parse(get_parser()(tokens), tokens).evaluate()
+
+
+def main(repeat: int):
+    table = token_table()
+    lexer = Lexer.__new__(Lexer)
+
+    regexs_time, regexs = best_of(repeat, lambda: [compile(r) for _, r in table])
+    nfa_states = sum(regex.automaton.states for regex in regexs)
+
+    rows = list(range(len(table)))
+    union, classes = lexer._build_regexs(table, rows, lambda n: regexs[n])
+    union_time, _ = best_of(repeat, lambda: lexer._build_automaton(union))
+
+    total_time, built = best_of(
+        repeat, lambda: Lexer(table, GRAMMAR.EOF, cache=False).table
+    )
+
+    print(f"{'phase':>22} {'states':>8} {'seconds':>10}")
+    print(f"{'compile regexs':>22} {nfa_states:>8} {regexs_time:>10.3f}")
+    print(f"{'to_deterministic':>22} {'':>8} {union_time:>10.3f}")
+    print(f"{'lexer build':>22} {built.states:>8} {total_time:>10.3f}")
+
+    print()
+    print(f"{'(a|b)*a(a|b)^n':>22} {'states':>8} {'nfa_to_dfa':>12} {'to_det':>10}")
+    for n in SYNTHETIC_SIZES:
+        automaton = nfa("(a|b)*a" + "(a|b)" * n)
+        dfa_time, dfa = best_of(repeat, lambda: nfa_to_dfa(automaton))
+        start = State.from_nfa(automaton)
+        det_time, _ = best_of(repeat, start.to_deterministic)
+        print(f"{n:>22} {dfa.states:>8} {dfa_time:>12.3f} {det_time:>10.3f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 3)
@@ -0,0 +1,62 @@
+"""
+Import time of the `bruce` package and of the cost deferred to first use.
+
+Run from the repository root with:
+
+    python -m benchmarks.import_time [RUNS]
+
+Each module is imported in a fresh interpreter with `-X importtime`, and the
+cumulative time reported for it is kept. The best of `RUNS` runs is shown.
+"""
+
+import subprocess
+import sys
+
+
+MODULES = ["bruce", "bruce.ast", "bruce.tools.regex"]
+
+FIRST_USE = "import bruce; bruce.get_lexer(); bruce.get_context(); bruce.get_scope()"
+
+
+def import_time(module: str) -> int:
+    """Cumulative import time of `module`, in microseconds."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    for line in result.stderr.splitlines():
+        _, cumulative_us, name = line.split("|")
+        if name.strip() == module:
+            return int(cumulative_us)
+    raise RuntimeError(f"no import time reported for {module}")
+
+
+def first_use_time() -> float:
+    """Seconds to build the lexer, context and scope in a fresh interpreter."""
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import time; start = time.perf_counter(); "
+            f"{FIRST_USE}; print(time.perf_counter() - start)",
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return float(result.stdout)
+
+
+def main(runs: int):
+    for module in MODULES:
+        best = min(import_time(module) for _ in range(runs))
+        print(f"import {module:<20} {best / 1000:>8.2f} ms")
+
+    best = min(first_use_time() for _ in range(runs))
+    print(f"{'first use':<27} {best * 1000:>8.2f} ms")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
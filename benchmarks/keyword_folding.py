@@ -0,0 +1,36 @@
+"""
+Size and build time of the HULK lexer automaton with and without keyword
+folding, where keyword rows are matched as identifiers and reclassified.
+
+Run from the repository root with:
+
+    python -m benchmarks.keyword_folding
+
+Both lexers are built from scratch, bypassing the on-disk cache.
+"""
+
+import time
+
+from bruce import token_table
+from bruce.grammar import GRAMMAR
+from bruce.tools.lexer import Lexer
+
+
+def main():
+    table = token_table()
+
+    print(f"{'keywords':>10} {'states':>8} {'classes':>8} {'build (s)':>10}")
+    for fold_keywords in (False, True):
+        start = time.perf_counter()
+        lexer = Lexer(table, GRAMMAR.EOF, cache=False, fold_keywords=fold_keywords)
+        elapsed = time.perf_counter() - start
+
+        label = "folded" if fold_keywords else "in DFA"
+        print(
+            f"{label:>10} {lexer.table.states:>8} "
+            f"{lexer.table.width - 1:>8} {elapsed:>10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
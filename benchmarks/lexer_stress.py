@@ -0,0 +1,120 @@
+"""
+Lexing of random binary input, which is mostly made of characters no token
+matches, under a time bound.
+
+Run from the repository root with:
+
+    python -m benchmarks.lexer_stress [SIZE_KB [SECONDS]]
+
+Random bytes are decoded as Latin-1 and lexed by both backends in a child
+process, which is killed if it doesn't finish in `SECONDS`: a lexer that
+doesn't move past an error never does. Every text is lexed whole and
+streamed in chunks of `CHUNK_SIZE` characters, and so is a run of `SIZE_KB`
+characters no token matches, a single error spanning many chunks. Streaming
+must take at most `STREAM_SLOWDOWN` times as long as lexing the whole text,
+plus a second, which it doesn't if it scans a token again for every chunk
+it spans. Every token must be nonempty and start after the previous one,
+the end of file must be at the end of the input, and a stream must give the
+same tokens as the whole text. Exits with status 1 if a check fails or the
+time runs out.
+"""
+
+import io
+import multiprocessing
+import random
+import sys
+import time
+
+from bruce import get_lexer, token_table
+from bruce.grammar import GRAMMAR
+from bruce.tools.lexer import create_lexer
+
+
+SEEDS = range(8)
+CHUNK_SIZE = 256
+STREAM_SLOWDOWN = 4
+
+# a character no token matches
+UNMATCHED = "\xa4"
+
+
+def check(tokens, size: int) -> str | None:
+    """
+    Returns what is wrong with `tokens`, lexed from a text of `size`
+    characters, or `None` if nothing is.
+    """
+
+    *tokens, eof = tokens
+    offset = -1
+    for token in tokens:
+        if not token.lex or token.offset <= offset:
+            return f"token {token!r} at {token.offset} after {offset}"
+        offset = token.offset
+    if eof.offset != size:
+        return f"end of file at {eof.offset}, expected {size}"
+    return None
+
+
+def fields(tokens):
+    return [(token.lex, token.token_type, token.offset) for token in tokens]
+
+
+def lex_all(size_kb: int):
+    lexers = {
+        "dfa": get_lexer(),
+        "re": create_lexer(token_table(), GRAMMAR.EOF, backend="re"),
+    }
+
+    sources = []
+    for seed in SEEDS:
+        rng = random.Random(seed)
+        sources.append((seed, rng.randbytes(size_kb * 1024).decode("latin-1")))
+    sources.append(("run", UNMATCHED * (size_kb * 1024)))
+
+    print(
+        f"{'backend':>8} {'seed':>5} {'tokens':>8} {'errors':>8} {'whole':>8} "
+        f"{'stream':>8}"
+    )
+    for seed, text in sources:
+        for name, lexer in lexers.items():
+            start = time.perf_counter()
+            tokens = lexer(text)
+            elapsed = time.perf_counter() - start
+
+            start = time.perf_counter()
+            streamed = list(lexer.stream(io.StringIO(text), CHUNK_SIZE))
+            streaming = time.perf_counter() - start
+
+            problem = check(tokens, len(text)) or check(streamed, len(text))
+            if problem is None and fields(streamed) != fields(tokens):
+                problem = "the stream gives other tokens than the whole text"
+            if problem is None and streaming > STREAM_SLOWDOWN * elapsed + 1:
+                problem = f"streaming took {streaming:.2f} s, against {elapsed:.2f} s"
+            if problem is not None:
+                print(f"{name} backend, seed {seed}: {problem}")
+                sys.exit(1)
+
+            errors = sum(not token.is_valid for token in tokens)
+            print(
+                f"{name:>8} {seed:>5} {len(tokens) - 1:>8} {errors:>8} "
+                f"{elapsed:>8.2f} {streaming:>8.2f}"
+            )
+
+
+def main(size_kb: int, seconds: float):
+    # the automaton is built, or loaded, before the clock starts
+    get_lexer()
+
+    child = multiprocessing.Process(target=lex_all, args=(size_kb,))
+    child.start()
+    child.join(seconds)
+    if child.is_alive():
+        child.terminate()
+        print(f"timed out after {seconds} s")
+        sys.exit(1)
+    sys.exit(child.exitcode)
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    main(int(args[0]) if args else 256, float(args[1]) if len(args) > 1 else 120)
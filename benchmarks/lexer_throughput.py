@@ -0,0 +1,41 @@
+"""
+Lexing throughput on generated HULK sources of growing size.
+
+Run from the repository root with:
+
+    python -m benchmarks.lexer_throughput [SIZE_KB ...]
+
+Time per KB should stay flat as the input grows: lexing is linear in the
+size of the source.
+"""
+
+import sys
+import time
+
+from bruce import get_lexer
+
+from ._corpus import hulk_source
+
+
+DEFAULT_SIZES_KB = [1, 10, 100, 1_000, 10_000, 50_000]
+
+
+def main(sizes_kb: list[int]):
+    lexer = get_lexer()
+
+    print(f"{'size':>10} {'tokens':>10} {'seconds':>10} {'us/KB':>10} {'MB/s':>8}")
+    for size_kb in sizes_kb:
+        text = hulk_source(size_kb * 1024)
+
+        start = time.perf_counter()
+        tokens = lexer(text)
+        elapsed = time.perf_counter() - start
+
+        print(
+            f"{size_kb:>8}KB {len(tokens):>10} {elapsed:>10.3f} "
+            f"{elapsed / size_kb * 1e6:>10.1f} {size_kb / 1024 / elapsed:>8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES_KB)
@@ -0,0 +1,66 @@
+"""
+Lexing with `Lexer.parallel` in pools of growing size, against lexing
+sequentially into a `TokenBuffer`, on a generated HULK source.
+
+Run from the repository root with:
+
+    python -m benchmarks.parallel_lexing [SIZE_KB [WORKERS ...]]
+
+The source is split so every worker gets 4 chunks. Stitching the chunks is
+the part of a parallel lex the parent does alone, so it is also timed on its
+own, over chunks lexed in this process: the sequential time over the
+stitching time bounds the speedup of any number of workers.
+"""
+
+import os
+import sys
+import time
+
+from bruce import get_lexer
+from bruce.tools.lexer import _init_worker, _lex_chunk
+
+from ._corpus import hulk_source
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+
+def main(size_kb: int, pools: list[int]):
+    lexer = get_lexer()
+    text = hulk_source(size_kb * 1024)
+
+    expected, sequential = timed(lambda: lexer.buffer(text))
+    print(f"{size_kb} KB, {len(expected)} tokens, {os.cpu_count()} CPUs")
+    print(f"sequential {sequential:>8.2f} s")
+
+    types, ids = lexer._buffer_types()
+    _init_worker(lexer.table, lexer.keywords, [ids.get(t) for t in lexer.token_types])
+    starts = lexer._split(text, len(text) // 16)
+    ends = starts[1:] + [len(text)]
+    chunks = [_lex_chunk(a, text[a:b]) for a, b in zip(starts, ends)]
+    _, stitching = timed(lambda: lexer._stitch(text, types, chunks))
+    print(
+        f"stitching  {stitching:>8.2f} s, speedup bound {sequential / stitching:.1f}x"
+    )
+
+    print(f"{'workers':>8} {'seconds':>8} {'speedup':>8}")
+    for workers in pools:
+        chunk_size = len(text) // (4 * workers) + 1
+        buffer, elapsed = timed(lambda: lexer.parallel(text, workers, chunk_size))
+        assert (buffer.kinds, buffer.offsets, buffer.lengths) == (
+            expected.kinds,
+            expected.offsets,
+            expected.lengths,
+        )
+        print(f"{workers:>8} {elapsed:>8.2f} {sequential / elapsed:>7.2f}x")
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(
+        args[0] if args else 2048,
+        args[1:] or sorted({1, 2, 4, os.cpu_count() or 1}),
+    )
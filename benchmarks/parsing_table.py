@@ -0,0 +1,57 @@
+"""
+Cost of getting the LL(1) parsing tables of the HULK and regex grammars:
+building them from scratch, loading them from the on-disk cache and looking
+them up once the process has them.
+
+Run from the repository root with:
+
+    python -m benchmarks.parsing_table [RUNS]
+
+The on-disk cache is written to a temporary directory. The best of `RUNS`
+runs is shown.
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+from bruce.grammar import GRAMMAR
+from bruce.tools import parser, regex
+
+
+GRAMMARS = {"hulk": GRAMMAR, "regex": regex.GRAMMAR}
+
+
+def best(runs: int, function) -> float:
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main(runs: int):
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ["BRUCE_CACHE_DIR"] = directory
+
+        print(f"{'grammar':>8} {'build':>10} {'disk':>10} {'memo':>10}")
+        for name, G in GRAMMARS.items():
+
+            def build():
+                parser._tables.clear()
+                parser.parsing_table(G, cache=False)
+
+            def load():
+                parser._tables.clear()
+                parser.parsing_table(G)
+
+            load()
+            times = [best(runs, build), best(runs, load)]
+            times.append(best(runs, lambda: parser.parsing_table(G)))
+            print(f"{name:>8}" + "".join(f" {t * 1000:>7.2f} ms" for t in times))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
@@ -0,0 +1,54 @@
+"""
+Lexing time of the `re` backend against the DFA lexer, after checking that
+both produce the same tokens.
+
+Run from the repository root with:
+
+    python -m benchmarks.re_backend [SIZE_KB ...]
+
+`scan` times only finding the tokens; `lex` includes building them.
+"""
+
+import sys
+import time
+from collections import deque
+
+from bruce import get_lexer, token_table
+from bruce.grammar import GRAMMAR
+from bruce.tools.lexer import check_lexers, create_lexer
+
+from ._corpus import hulk_source
+
+
+DEFAULT_SIZES_KB = [10, 100, 1_000]
+
+
+def timed(function, text) -> float:
+    start = time.perf_counter()
+    function(text)
+    return time.perf_counter() - start
+
+
+def main(sizes_kb: list[int]):
+    lexers = {
+        "dfa": get_lexer(),
+        "re": create_lexer(token_table(), GRAMMAR.EOF, backend="re"),
+    }
+
+    sources = [hulk_source(size_kb * 1024) for size_kb in sizes_kb]
+    mismatches = check_lexers(lexers["dfa"], lexers["re"], sources)
+    for n, m, expected, actual in mismatches:
+        print(f"{sizes_kb[n]}KB: token {m} is {actual!r}, expected {expected!r}")
+    if mismatches:
+        sys.exit(1)
+
+    print(f"{'size':>10} {'backend':>8} {'scan (s)':>10} {'lex (s)':>10}")
+    for size_kb, text in zip(sizes_kb, sources):
+        for name, lexer in lexers.items():
+            scan = timed(lambda text: deque(lexer._tokenize((text,)), 0), text)
+            lex = timed(lexer, text)
+            print(f"{size_kb:>8}KB {name:>8} {scan:>10.3f} {lex:>10.3f}")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES_KB)
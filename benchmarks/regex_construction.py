@@ -0,0 +1,61 @@
+"""
+Regex compilation through a Thompson NFA and subset construction against
+the direct construction from followpos sets, on the HULK token table and on
+`(a|b)*a(a|b)...(a|b)`, whose DFA doubles in size with every `(a|b)`.
+
+Run from the repository root with:
+
+    python -m benchmarks.regex_construction [REPEAT]
+
+DFAs are not minimized, so the state counts are those of each construction.
+The best of `REPEAT` runs (5 by default) is reported.
+"""
+
+import sys
+import time
+
+from bruce import token_table
+from bruce.tools.regex import Regex
+
+
+SYNTHETIC_SIZES = [6, 8, 10]
+
+
+def best_of(repeat, build):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = build()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def compile_all(patterns, direct):
+    regexs = [Regex(pattern, minimize=False, direct=direct) for pattern in patterns]
+    return [regex.automaton for regex in regexs]
+
+
+def main(repeat: int):
+    workloads = [("HULK token table", [regex for _, regex in token_table()])]
+    for n in SYNTHETIC_SIZES:
+        workloads.append((f"(a|b)*a(a|b)^{n}", ["(a|b)*a" + "(a|b)" * n]))
+
+    print(
+        f"{'patterns':>18} {'thompson':>10} {'states':>8} "
+        f"{'direct':>10} {'states':>8} {'speedup':>8}"
+    )
+    for name, patterns in workloads:
+        results = []
+        for direct in (False, True):
+            elapsed, automata = best_of(repeat, lambda: compile_all(patterns, direct))
+            results.append((elapsed, sum(a.states for a in automata)))
+
+        (thompson, thompson_states), (direct, direct_states) = results
+        print(
+            f"{name:>18} {thompson:>10.4f} {thompson_states:>8} "
+            f"{direct:>10.4f} {direct_states:>8} {thompson / direct:>7.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
@@ -0,0 +1,63 @@
+"""
+Latency of `Lexer.relex` for one-character edits at random places of HULK
+sources of growing size, against lexing the whole source again.
+
+Run from the repository root with:
+
+    python -m benchmarks.relex_latency [LINES ...]
+
+Each source gets 200 edits, alternating insertions and deletions, after
+which its tokens are checked against a full lex. Latency should stay flat as
+the source grows: only the blocks of lines around an edit are rewritten.
+"""
+
+import random
+import sys
+import time
+
+from bruce import get_lexer
+
+from ._corpus import SAMPLE
+
+
+DEFAULT_LINES = [1_000, 10_000, 20_000, 100_000]
+EDITS = 200
+
+
+def main(sizes: list[int]):
+    lexer = get_lexer()
+    rng = random.Random(0)
+
+    print(f"{'lines':>8} {'full':>10} {'p50':>10} {'p99':>10} {'max':>10}")
+    for size in sizes:
+        text = SAMPLE * (size // SAMPLE.count("\n"))
+
+        start = time.perf_counter()
+        tokens = lexer(text)
+        full = time.perf_counter() - start
+
+        times = []
+        for n in range(EDITS):
+            offset = rng.randrange(len(text))
+            old_end, new_end = (offset, offset + 1) if n % 2 else (offset + 1, offset)
+            text = text[:offset] + "x" * (new_end - offset) + text[old_end:]
+
+            start = time.perf_counter()
+            lexer.relex(tokens, offset, old_end, new_end, text)
+            times.append(time.perf_counter() - start)
+
+        fields = [(t.lex, t.token_type, t.offset, t.position) for t in tokens]
+        assert fields == [
+            (t.lex, t.token_type, t.offset, t.position) for t in lexer(text)
+        ]
+
+        times.sort()
+        p50, p99 = times[len(times) // 2], times[len(times) * 99 // 100]
+        print(
+            f"{size:>8} {full * 1000:>7.1f} ms {p50 * 1000:>7.3f} ms "
+            f"{p99 * 1000:>7.3f} ms {times[-1] * 1000:>7.3f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_LINES)
@@ -0,0 +1,78 @@
+"""
+Import time and throughput of a scanner module generated from the HULK
+lexer, against the lexer itself.
+
+Run from the repository root with:
+
+    python -m benchmarks.scanner_codegen [SIZE_KB]
+
+The module is written to a temporary directory and byte-compiled, as it would
+be when shipped. Its import time is measured in a fresh interpreter. Lexing
+times include building the tokens; `scan` is the generated loop alone.
+"""
+
+import os
+import py_compile
+import subprocess
+import sys
+import tempfile
+import time
+
+from bruce import get_lexer
+from bruce.grammar import GRAMMAR
+from bruce.tools.lexer import load_scanner
+
+from ._corpus import hulk_source
+
+
+def import_time(directory: str) -> float:
+    """Seconds to import the generated module in a fresh interpreter."""
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import time; start = time.perf_counter(); import hulk_scanner; "
+            "print(time.perf_counter() - start)",
+        ],
+        cwd=directory,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return float(result.stdout)
+
+
+def timed(function, text) -> float:
+    start = time.perf_counter()
+    function(text)
+    return time.perf_counter() - start
+
+
+def main(size_kb: int):
+    lexer = get_lexer()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "hulk_scanner.py")
+        lexer.generate(path)
+        py_compile.compile(path)
+
+        best = min(import_time(directory) for _ in range(5))
+        print(f"{'import':<12} {best * 1000:>8.2f} ms")
+
+        sys.path.insert(0, directory)
+        import hulk_scanner
+
+    text = hulk_source(size_kb * 1024)
+    generated = load_scanner(hulk_scanner, GRAMMAR)
+    runs = [
+        ("lexer", lexer),
+        ("generated", generated),
+        ("scan", lambda text: list(hulk_scanner.scan(text))),
+    ]
+    for name, function in runs:
+        elapsed = timed(function, text)
+        print(f"{name:<12} {elapsed:>8.3f} s {size_kb / 1024 / elapsed:>8.2f} MB/s")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000)
@@ -1,25 +1,20 @@
-from math import pi, e
-
-from .tools.lexer import create_lexer, keyword_row
-from .tools.semantic.context import Context
-from .tools.semantic.scope import Scope
-from . import grammar as g
-from . import types as t
-from . import names as n
-
-from .grammar import GRAMMAR
-from .tools.parser import UnexpectedToken, create_parser, evaluate_parse
-from .visitors.desugarer import Desugarer
-from .visitors.type_builder import TypeCollector, TypeBuilder
-from .visitors.function_collector import FunctionCollector
-from .visitors.checker import SemanticChecker
-from .visitors.type_inferer import TypeInferer
-from .visitors.type_checker import TypeChecker
-from .visitors.evaluator import Evaluator
-
-
-lexer = create_lexer(
-    [
+"""
+The HULK front end. Importing this package is cheap: the lexer, the builtin
+context and the builtin scope are only built when first needed, either
+through `get_lexer`, `get_context` and `get_scope` or through the `lexer`,
+`context` and `scope` attributes.
+"""
+
+import io
+from functools import cache
+
+
+def token_table():
+    from .tools.lexer import keyword_row
+    from . import grammar as g
+    from . import names as n
+
+    return [
         keyword_row(g.let),
         keyword_row(g.in_k),
         keyword_row(g.if_k),
@@ -58,8 +53,8 @@ lexer = create_lexer(
         (g.rparen, r"\)"),
         keyword_row(g.lbrace),
         keyword_row(g.rbrace),
-        keyword_row(g.lbracket),
-        keyword_row(g.rbracket),
+        (g.lbracket, r"\["),
+        (g.rbracket, r"\]"),
         keyword_row(g.colon),
         keyword_row(g.semicolon),
         keyword_row(g.dot),
@@ -86,54 +81,121 @@ lexer = create_lexer(
                 ]
             ),
         ),
-        (g.type_identifier, r"A-Z(a-z|A-Z|0-9|_)*"),
-        (g.identifier, r"(a-z|_)(a-z|A-Z|0-9|_)*"),
-        (g.number, r"(0|1-90-9*)(.0-90-9*)?"),
-        (g.string, '"(\\\\"|\x00-!|#-\x7f)*"'),
+        (g.type_identifier, r"A-Z[a-zA-Z0-9_]*"),
+        (g.identifier, r"[a-z_][a-zA-Z0-9_]*"),
+        (g.number, r"(0|1-9[0-9]*)(.[0-9][0-9]*)?"),
+        (g.string, '"(\\\\"|[\x00-!#-\x7f])*"'),
         (None, " *"),
         (None, "\n*"),
         (None, "\r*"),
         (None, "\r\n*"),
         (None, "\t*"),
-        (None, "//(\x00-\t|\x0b-\x7f)*"),
-    ],
-    g.GRAMMAR.EOF,
-)
-
-
-context = Context(
-    [t.OBJECT_TYPE, t.NUMBER_TYPE, t.STRING_TYPE, t.BOOLEAN_TYPE],
-    [t.ITERABLE_PROTO],
-)
-
-scope = Scope()
-scope.define_constant(n.E_CONST_NAME, t.NUMBER_TYPE, (e, t.NUMBER_TYPE))
-scope.define_constant(n.PI_CONST_NAME, t.NUMBER_TYPE, (pi, t.NUMBER_TYPE))
-scope.define_function(n.PRINT_FUNC_NAME, [("obj", t.OBJECT_TYPE)], t.OBJECT_TYPE)
-scope.define_function(
-    n.RANGE_FUNC_NAME,
-    [("min", t.NUMBER_TYPE), ("max", t.NUMBER_TYPE)],
-    t.VectorType(t.NUMBER_TYPE),
-)
-scope.define_function(n.SQRT_FUNC_NAME, [("value", t.NUMBER_TYPE)], t.NUMBER_TYPE)
-scope.define_function(n.EXP_FUNC_NAME, [("value", t.NUMBER_TYPE)], t.NUMBER_TYPE)
-scope.define_function(
-    n.LOG_FUNC_NAME, [("base", t.NUMBER_TYPE), ("value", t.NUMBER_TYPE)], t.NUMBER_TYPE
-)
-scope.define_function(n.RAND_FUNC_NAME, [], t.NUMBER_TYPE)
-scope.define_function(n.SIN_FUNC_NAME, [("angle", t.NUMBER_TYPE)], t.NUMBER_TYPE)
-scope.define_function(n.COS_FUNC_NAME, [("angle", t.NUMBER_TYPE)], t.NUMBER_TYPE)
-
-
-def pipeline(program: str):
-    tokens = lexer(program)
-    parser = create_parser(GRAMMAR)
+        (None, "//[\x00-\t\x0b-\x7f]*"),
+    ]
+
+
+@cache
+def get_lexer():
+    from .tools.lexer import create_lexer
+    from .grammar import GRAMMAR
+
+    return create_lexer(token_table(), GRAMMAR.EOF)
+
+
+@cache
+def get_context():
+    from .tools.semantic.context import Context
+    from . import types as t
+
+    return Context(
+        [t.OBJECT_TYPE, t.NUMBER_TYPE, t.STRING_TYPE, t.BOOLEAN_TYPE],
+        [t.ITERABLE_PROTO],
+    )
+
+
+@cache
+def get_scope():
+    from math import pi, e
+
+    from .tools.semantic.scope import Scope
+    from . import types as t
+    from . import names as n
+
+    scope = Scope()
+    scope.define_constant(n.E_CONST_NAME, t.NUMBER_TYPE, (e, t.NUMBER_TYPE))
+    scope.define_constant(n.PI_CONST_NAME, t.NUMBER_TYPE, (pi, t.NUMBER_TYPE))
+    scope.define_function(n.PRINT_FUNC_NAME, [("obj", t.OBJECT_TYPE)], t.OBJECT_TYPE)
+    scope.define_function(
+        n.RANGE_FUNC_NAME,
+        [("min", t.NUMBER_TYPE), ("max", t.NUMBER_TYPE)],
+        t.VectorType(t.NUMBER_TYPE),
+    )
+    scope.define_function(n.SQRT_FUNC_NAME, [("value", t.NUMBER_TYPE)], t.NUMBER_TYPE)
+    scope.define_function(n.EXP_FUNC_NAME, [("value", t.NUMBER_TYPE)], t.NUMBER_TYPE)
+    scope.define_function(
+        n.LOG_FUNC_NAME,
+        [("base", t.NUMBER_TYPE), ("value", t.NUMBER_TYPE)],
+        t.NUMBER_TYPE,
+    )
+    scope.define_function(n.RAND_FUNC_NAME, [], t.NUMBER_TYPE)
+    scope.define_function(n.SIN_FUNC_NAME, [("angle", t.NUMBER_TYPE)], t.NUMBER_TYPE)
+    scope.define_function(n.COS_FUNC_NAME, [("angle", t.NUMBER_TYPE)], t.NUMBER_TYPE)
+
+    return scope
+
+
+_LAZY_ATTRIBUTES = {"lexer": get_lexer, "context": get_context, "scope": get_scope}
+
+
+def __getattr__(name):
     try:
-        left_parse = parser(tokens)
+        return _LAZY_ATTRIBUTES[name]()
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def pipeline(program: str | io.TextIOBase):
+    from collections import deque
+    from itertools import tee
+
+    from .grammar import GRAMMAR
+    from .tools.lexer import lexical_errors
+    from .tools.parser import UnexpectedToken, create_parser, evaluate_parse
+    from .visitors.desugarer import Desugarer
+    from .visitors.type_builder import TypeCollector, TypeBuilder
+    from .visitors.function_collector import FunctionCollector
+    from .visitors.checker import SemanticChecker
+    from .visitors.type_inferer import TypeInferer
+    from .visitors.type_checker import TypeChecker
+    from .visitors.evaluator import Evaluator
+
+    context = get_context()
+    scope = get_scope()
+
+    # tokens are streamed to the parser, or built from a compact buffer for
+    # sources given as strings, and the parser is consumed by the evaluation
+    # of the parse as it goes, so only a few tokens are alive at any time
+    lexer = get_lexer()
+    if isinstance(program, str):
+        tokens = lexer.buffer(program)
+    else:
+        tokens = lexer.stream(program)
+    errors = []
+    valid_tokens = lexical_errors(tokens, errors)
+    tokens, parsed_tokens = tee(valid_tokens)
+    parser = create_parser(GRAMMAR, lazy=True)
+    try:
+        ast = evaluate_parse(parser(parsed_tokens), tokens)
     except UnexpectedToken as e:
-        print(e)
+        # the rest of the source is lexed so all its lexical errors are
+        # reported, since they are likely what the parser tripped on
+        deque(valid_tokens, 0)
+        if len(errors) == 0:
+            print(e)
+            return
+    if len(errors) > 0:
+        print(f"Lexer: \n{errors}")
         return
-    ast = evaluate_parse(left_parse, tokens)
     des = Desugarer()
     ast = des.visit(ast)
 
@@ -0,0 +1,107 @@
+"""
+On-disk cache for artifacts that are expensive to build, like the lexer
+automaton.
+
+Entries live in `$BRUCE_CACHE_DIR` when that variable is set, otherwise in
+`$XDG_CACHE_HOME/bruce` (`~/.cache/bruce` by default). Every entry is stored
+along with the key it was built from, so an entry whose inputs changed is
+detected as stale and rebuilt. Pickled entries start with the SHA-256 digest
+of the rest, so a damaged one is rebuilt too instead of being trusted.
+"""
+
+import hashlib
+import mmap
+import os
+import pickle
+import tempfile
+
+
+DIGEST_SIZE = hashlib.sha256().digest_size
+
+
+def cache_dir() -> str:
+    path = os.environ.get("BRUCE_CACHE_DIR")
+    if path:
+        return path
+
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(base, "bruce")
+
+
+def fingerprint(*parts) -> str:
+    return hashlib.sha256(repr(parts).encode("utf8")).hexdigest()
+
+
+def entry_path(
+    name: str, key: str, directory: str | None = None, suffix: str = ".pkl"
+) -> str:
+    return os.path.join(directory or cache_dir(), f"{name}-{key[:16]}{suffix}")
+
+
+def load(name: str, key: str, directory: str | None = None):
+    """
+    Returns the value stored under `name` for `key`, or `None` if there
+    is no such entry or it is stale, damaged or unreadable.
+    """
+
+    try:
+        with open(entry_path(name, key, directory), "rb") as f:
+            data = f.read()
+        digest, payload = data[:DIGEST_SIZE], data[DIGEST_SIZE:]
+        if hashlib.sha256(payload).digest() != digest:
+            return None
+        stored_key, value = pickle.loads(payload)
+    except Exception:
+        return None
+
+    return value if stored_key == key else None
+
+
+def store(name: str, key: str, value, directory: str | None = None):
+    """
+    Stores `value` under `name` for `key`. The entry is written to a
+    temporary file first, so concurrent readers never see a partial entry.
+    Failing to write the cache is not an error.
+    """
+
+    payload = pickle.dumps((key, value), pickle.HIGHEST_PROTOCOL)
+    write(entry_path(name, key, directory), hashlib.sha256(payload).digest() + payload)
+
+
+def map_entry(name: str, key: str, directory: str | None = None):
+    """
+    Returns a read-only `mmap` of the binary entry stored under `name` for
+    `key`, or `None` if there is none. Binary entries hold their own key, so
+    checking that it is not stale is up to the caller.
+    """
+
+    try:
+        with open(entry_path(name, key, directory, ".bin"), "rb") as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+
+def store_bytes(name: str, key: str, data: bytes, directory: str | None = None):
+    """
+    Stores the binary entry `data` under `name` for `key`, like `store`.
+    """
+
+    write(entry_path(name, key, directory, ".bin"), data)
+
+
+def write(path: str, data: bytes):
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+    except OSError:
+        pass
@@ -1,114 +1,914 @@
-import dill as pickle
+import codecs
+import re
+from array import array
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, zip_longest
 
-from .token import Token
-from .regex.automata import State
-from .regex import Regex
+from .token import ERROR, ErrorToken, LineIndex, Token, TokenBuffer
+from .regex.automata import (
+    CharSet,
+    State,
+    TransitionTable,
+    combine_classes,
+    label_intervals,
+)
+from .regex import compile as compile_regex, literals
+from .regex.serialize import FormatError, dump_table, load_table
+from .regex.translate import longest_first, translate
 from .grammar import Terminal, EOF
+from . import cache as lexer_cache
+
+
+# Bump whenever the layout or the construction of the cached table changes.
+TABLE_FORMAT_VERSION = 6
 
 
 class Lexer:
-    def __init__(self, table, eof):
+    def __init__(self, table, eof, cache=True, fold_keywords=True):
         self.eof = eof
+        self.token_types = [token_type for token_type, _ in table]
+
+        key = lexer_cache.fingerprint(
+            TABLE_FORMAT_VERSION,
+            eof.name,
+            fold_keywords,
+            [(token_type and token_type.name, regex) for token_type, regex in table],
+        )
+
+        built = self._load(key, len(table)) if cache else None
+        if built is None:
+            built = self._build(table, fold_keywords)
+            if cache:
+                data = dump_table(built[0], list(built[1].items()), key)
+                lexer_cache.store_bytes("lexer", key, data)
+
+        self.table, keywords = built
+        self.keywords = [keywords.get(n) for n in range(len(table))]
+
+    @staticmethod
+    def _load(key, rows):
+        """
+        Returns the table and the keywords cached under `key`, or `None` if
+        there are none or they are damaged, so they are built again.
+        """
+
+        mapped = lexer_cache.map_entry("lexer", key)
+        if mapped is None:
+            return None
+
         try:
-            self.regexs = self._build_regexs_deserialize(table)
-        except FileNotFoundError:
-            self._build_regexs_serialize(table)
-            self.regexs = self._build_regexs_deserialize(table)
-        self.automaton = self._build_automaton()
-
-    def _build_regexs_serialize(self, table):
-        for n, (token_type, regex) in enumerate(table):
-            r = Regex(regex)
-            with open(f"bruce/serialize_objects/regex_{n}.pkl", "wb") as f:
-                pickle.dump(r.automaton, f)
-
-    def _build_regexs_deserialize(self, table):
-        regexs = []
-        for n, (token_type, regex) in enumerate(table):
-            with open(f"bruce/serialize_objects/regex_{n}.pkl", "rb") as f:
-                automata = pickle.load(f)
-            start_state, states = State.from_nfa(automata, get_states=True)
-            for state in automata.finals:
-                states[state].tag = (token_type, n)
-            regexs.append(start_state)
-        return regexs
-
-    def _build_regexs(self, table):
+            table, keywords, stored_key = load_table(mapped)
+            keywords = {n: dict(words) for n, words in keywords}
+        except (FormatError, TypeError, ValueError):
+            return None
+
+        # accepted rows index the token table
+        accepted = chain(
+            table.accepts, *(words.values() for words in keywords.values())
+        )
+        if stored_key != key or not all(
+            isinstance(n, int) and -1 <= n < rows for n in chain(keywords, accepted)
+        ):
+            return None
+        return table, keywords
+
+    def _build(self, table, fold_keywords):
+        def regex(n):
+            return compile_regex(table[n][1])
+
+        folded, keywords = (
+            self._fold_keywords(table, regex) if fold_keywords else (set(), {})
+        )
+        rows = [n for n in range(len(table)) if n not in folded]
+        return self._build_table(*self._build_regexs(table, rows, regex)), keywords
+
+    def _fold_keywords(self, table, regex):
+        """
+        Finds the rows that only match literals also matched by other rows,
+        like keywords, which are identifiers too. Those rows are left out of
+        the automaton: their literals are matched by the other rows and then
+        reclassified. Returns the folded rows and, for each row that matches
+        folded literals, a map from those literals to the rows they belong to.
+        """
+
+        candidates = {}
+        for n, (_, pattern) in enumerate(table):
+            words = literals(pattern)
+            if words is not None:
+                candidates[n] = words
+
+        others = [n for n in range(len(table)) if n not in candidates]
+        folded = {
+            n
+            for n, words in candidates.items()
+            if all(any(regex(m)(word) for m in others) for word in words)
+        }
+
+        # the automaton matches a folded literal with the first kept row that
+        # accepts it; the literal keeps its own row if that one comes first
+        kept = [n for n in range(len(table)) if n not in folded]
+        keywords = {}
+        for n in sorted(folded):
+            for word in candidates[n]:
+                owner = next(m for m in kept if regex(m)(word))
+                if n < owner:
+                    keywords.setdefault(owner, {}).setdefault(word, n)
+
+        return folded, keywords
+
+    def _build_regexs(self, table, rows, regex):
+        automata = [regex(n).automaton for n in rows]
+        classes, splits = combine_classes([a.classes for a in automata])
+
         regexs = []
-        for n, (token_type, regex) in enumerate(table):
-            r = Regex(regex)
-            automata = r.automaton
-            start_state, states = State.from_nfa(automata, get_states=True)
-            for state in automata.finals:
-                states[state].tag = (token_type, n)
-            regexs.append(start_state)
-        return regexs
-
-    def _build_automaton(self):
+        for n, automaton, split in zip(rows, automata, splits):
+            states = [State(s, s in automaton.finals) for s in range(automaton.states)]
+            for (origin, c), (destination,) in automaton.map.items():
+                for symbol in split[c]:
+                    states[origin].add_transition(symbol, states[destination])
+            for state in automaton.finals:
+                states[state].tag = (table[n][0], n)
+            regexs.append(states[automaton.start])
+        return regexs, classes
+
+    def _build_automaton(self, regexs):
         start = State("start")
-        for state in self.regexs:
+        for state in regexs:
             start.add_epsilon_transition(state)
         return start.to_deterministic()
 
-    def _walk(self, string):
-        state = self.automaton
-        final = state if state.final else None
-        final_lex = lex = ""
-
-        for symbol in string:
-            lex += symbol
-            if symbol in state.transitions:
-                state = state.transitions[symbol][0]
-                if state.final:
-                    max_priority = len(self.regexs)
-                    for s in state.state:
-                        if s.final and s.tag[1] < max_priority:
-                            final = s.tag[0]
-                            max_priority = s.tag[1]
-                    final_lex = lex
-            else:
-                break  # TODO: Create an error handling
+    def _build_table(self, regexs, classes):
+        # each DFA state resolves its token once: the final NFA state
+        # with the highest priority (lowest row in the token table) wins
+        def accept(state):
+            rows = [s.tag[1] for s in state.state if s.final]
+            return min(rows, default=-1)
+
+        return TransitionTable.from_state(
+            self._build_automaton(regexs), classes, accept
+        ).minimize()
+
+    def _walk(self, text, start, state=None, final=-1, end=None):
+        """
+        Runs the automaton over `text` from `start`, or goes on with a walk
+        that got to `start` in `state`, having matched row `final` up to
+        `end`. Returns the table row of the longest match (`-1` if there is
+        none), the offset where it ends, the offset where the automaton
+        stopped, which is `len(text)` if it ran out of input, and the state it
+        ran out of input in, `-1` if it stopped before.
+        """
+
+        table = self.table
+        transitions = table.transitions
+        classes = table.classes
+        accepts = table.accepts
+        width = table.width
+
+        state = table.start if state is None else state
+        end = start if end is None else end
+
+        for index in range(start, len(text)):
+            state = transitions[state * width + classes[text[index]]]
+            if state < 0:
+                return final, end, index, -1
+            row = accepts[state]
+            if row >= 0:
+                final = row
+                end = index + 1
+
+        return final, end, len(text), state
+
+    def _skip(self, text, start, stop, exhausted=True):
+        """
+        Finds the end of the run of characters from `start` that no token
+        matches, which is the next offset a token matches at or `len(text)`.
+        Returns it, the furthest offset looked at, at least `stop`, and, if
+        more text may follow, the state of the walk from that offset when it
+        ran out of `text` without a match, `-1` otherwise.
+
+        Matches are only tried at the characters the automaton has a
+        transition for from its start state.
+        """
+
+        table = self.table
+        classes = table.classes
+        width = table.width
+        viable = table.transitions[table.start * width : (table.start + 1) * width]
+
+        for index in range(start + 1, len(text)):
+            if viable[classes[text[index]]] >= 0:
+                final, _, walked, state = self._walk(text, index)
+                stop = max(stop, walked)
+                if final >= 0:
+                    return index, stop, -1
+                if state >= 0 and not exhausted:
+                    return index, stop, state
+
+        return len(text), len(text), -1 if exhausted else table.start
+
+    def _extend(self, text, start, chunks, state, final, end):
+        """
+        Goes on with a walk from `start` that ran out of `text` in `state`,
+        having matched row `final` up to `end`, over the next `chunks`, until
+        the automaton stops or they run out. Returns the text from `start` on
+        with the chunks read, the row and the end of the longest match and
+        the offset where the automaton stopped, relative to `start`, and
+        whether the chunks ran out.
+        """
+
+        pieces = [text[start:]]
+        size = len(pieces[0])
+        end -= start
+        while True:
+            chunk = next(chunks, None)
+            if chunk is None:
+                return "".join(pieces), final, end, size, True
+            pieces.append(chunk)
+            row, stop, walked, state = self._walk(chunk, 0, state)
+            if row >= 0:
+                final, end = row, size + stop
+            size += walked
+            if state < 0:
+                return "".join(pieces), final, end, size, False
+
+    def _tokenize(self, chunks, start=0):
+        """
+        Yields `(lex, token_type, offset, stop)` for every match from offset
+        `start` of the text made by `chunks`, where `stop` is the offset of the
+        last character the automaton looked at. Runs of characters that no
+        token matches are yielded with the `ERROR` token type.
+
+        A walk that runs out of a chunk goes on in the next ones from the
+        state it stopped in, so every chunk is scanned once, however many of
+        them a token spans.
+        """
 
-        return final, final_lex
+        token_types = self.token_types
+        keywords = self.keywords
 
-    def _tokenize(self, text):
-        index = 0
+        chunks = iter(chunks)
+        text = next(chunks, "")
+        # offset of `text` in the source
+        base = 0
+        index = start
+        exhausted = False
 
-        while index < len(text):
-            final, lex = self._walk(text[index:])
-            index += len(lex)
-            yield lex, final
+        while True:
+            final, end, stop, state = self._walk(text, index)
+            if state >= 0 and not exhausted:
+                # the match may go on in the next chunk
+                text, final, end, stop, exhausted = self._extend(
+                    text, index, chunks, state, final, end
+                )
+                base += index
+                index = 0
+            if index == len(text):
+                break
 
-        yield self.eof.name, self.eof
+            offset = base + index
+            if final < 0:
+                # the pieces of the error that are no longer in `text`
+                head = []
+                end, stop, state = self._skip(text, index, stop, exhausted)
+                while state >= 0:
+                    # a match may start at `end` and go on in the next chunk
+                    head.append(text[index:end])
+                    text, final, _, stop, exhausted = self._extend(
+                        text, end, chunks, state, -1, end
+                    )
+                    base += end
+                    index = end = 0
+                    if final >= 0:
+                        break
+                    end, stop, state = self._skip(text, 0, stop, exhausted)
+                head.append(text[index:end])
+                lex = "".join(head)
+                ttype = ERROR
+            else:
+                lex = text[index:end]
+                words = keywords[final]
+                ttype = token_types[final if words is None else words.get(lex, final)]
+            yield lex, ttype, offset, base + stop
+            index = end
+
+        yield self.eof.name, self.eof, base + index, base + index
+
+    def _tokens(self, scans, lines, reach=-1, start=0):
+        # tokens store their offsets relative to the block of the line index
+        # they start in, which moves forward with the scan from `start`;
+        # blocks may be added as a stream is read, but only past its end
+        blocks = lines.blocks
+        n = lines.find(start)
+        limit = -1
+        for lex, ttype, offset, stop in scans:
+            # furthest offset looked at to produce this token or any before it
+            reach = max(reach, stop)
+            if ttype is None:
+                continue
+            if offset >= limit:
+                while n + 1 < len(blocks) and blocks[n + 1].base <= offset:
+                    n += 1
+                block = blocks[n]
+                base = block.base
+                limit = blocks[n + 1].base if n + 1 < len(blocks) else lines.size
+            if ttype is ERROR:
+                yield ErrorToken(lex, ttype, offset - base, reach - base, lines, block)
+            else:
+                yield Token(lex, ttype, offset - base, reach - base, lines, block)
 
     def __call__(self, text):
-        tokens = []
-        line = 1
-        column = 1
-        for lex, ttype in self._tokenize(text):
+        return list(self._tokens(self._tokenize((text,)), LineIndex(text)))
+
+    def buffer(self, text):
+        """
+        Lexes `text` into a `TokenBuffer`, which holds the same tokens as
+        `lexer(text)` in a fraction of the memory, without their reaches.
+        """
+
+        types, ids = self._buffer_types()
+        buffer = TokenBuffer(text, types)
+        self._fill(buffer, ids, self._tokenize((text,)))
+        return buffer
+
+    def _buffer_types(self):
+        # errors and the end of file come first, so workers know their ids
+        types = [ERROR, self.eof]
+        types += {t: None for t in self.token_types if t is not None}
+        return types, {t: n for n, t in enumerate(types)}
+
+    def _fill(self, buffer, ids, scans):
+        eof = self.eof
+        kinds = buffer.kinds.append
+        offsets = buffer.offsets.append
+        lengths = buffer.lengths.append
+        for lex, ttype, offset, _ in scans:
+            if ttype is not None:
+                kinds(ids[ttype])
+                offsets(offset)
+                # the end of file is not part of the text
+                lengths(0 if ttype is eof else len(lex))
+
+    def relex(self, tokens, start, old_end, new_end, text):
+        """
+        Updates `tokens`, the result of lexing a source, after an edit that
+        replaced the range `[start, old_end)` of that source with the range
+        `[start, new_end)` of `text`, the edited source.
+
+        Lexing restarts at the last token boundary whose preceding matches
+        never looked at the edited range, and stops as soon as a new token
+        starts after the edit where an old token started, since the rest of
+        the token stream is known to be the same from there. The list and
+        the line index its tokens share are updated in place, and the list is
+        returned.
+
+        Tokens after the edit are moved with the blocks of the line index
+        they are stored relative to, so only those in the blocks around the
+        edit are rewritten.
+        """
+
+        delta = new_end - old_end
+        lines = tokens[-1].lines
+
+        keep = bisect_left(tokens, start, key=lambda t: t.reach)
+        if keep > 0:
+            last = tokens[keep - 1]
+            index, reach = last.offset + len(last.lex), last.reach
+        else:
+            index, reach = 0, -1
+
+        # scanned before the line index is edited, while the old tokens are
+        # still where they were in the old source
+        resume = bisect_left(tokens, old_end, keep, key=lambda t: t.offset)
+        scans = []
+        for lex, ttype, offset, stop in self._tokenize((text,), index):
+            reach = max(reach, stop)
             if ttype is None:
-                if lex[0] == "\n":
-                    line += len(lex)
-                    column = 1
-                elif lex[0] == "\r":
-                    line += len(lex)
-                    column = 1
-                elif lex[0:2] == "\r\n":
-                    line += len(lex) // 2
-                    column = 1
-                elif lex[0] == "\t":
-                    column += len(lex) * 4
-                else:
-                    column += 1
                 continue
-            tokens.append(Token(lex, ttype, line, column))
-            column += len(lex)
+            if offset >= new_end:
+                while tokens[resume].offset < offset - delta:
+                    resume += 1
+                if tokens[resume].offset == offset - delta:
+                    break
+            scans.append((lex, ttype, offset, reach))
+
+        old, new = lines.edit(start, old_end, new_end, text)
+        fresh = list(self._tokens(scans, lines, -1, index))
+
+        # the tokens after the resynchronization point only move, and reach
+        # at least as far as the token there did
+        floor = reach
+        n = 0
+        for m in range(resume, len(tokens)):
+            t = tokens[m]
+            block = t.block
+            if block in old:
+                # their block was rebuilt, and its base didn't move with them
+                offset = block.base + t._offset + delta
+                reach = max(block.base + t._reach + delta, floor)
+                while n + 1 < len(new) and new[n + 1].base <= offset:
+                    n += 1
+                t.block = block = new[n]
+                t._offset = offset - block.base
+                t._reach = reach - block.base
+            elif block.base + t._reach < floor:
+                t._reach = floor - block.base
+            else:
+                break
+
+        tokens[keep:resume] = fresh
         return tokens
 
+    def parallel(self, text, workers=None, chunk_size=1 << 22):
+        """
+        Lexes `text` in a pool of `workers` processes into a `TokenBuffer`
+        that holds the same tokens as `lexer.buffer(text)`.
+
+        The text is split in chunks of about `chunk_size` characters, each one
+        starting after a newline, and the chunks are lexed independently. A
+        chunk boundary may still fall inside a string or a comment, so chunks
+        are only trusted from the first token the sequential scan would also
+        produce: stitching lexes sequentially from the end of the previous
+        chunk until it lands on a token of the next one, and then copies the
+        rest of that chunk, which workers send in the columns of the buffer.
+        """
+
+        starts = self._split(text, chunk_size)
+        if len(starts) == 1:
+            return self.buffer(text)
+
+        types, ids = self._buffer_types()
+        ends = starts[1:] + [len(text)]
+        with ProcessPoolExecutor(
+            workers,
+            initializer=_init_worker,
+            initargs=(
+                self.table,
+                self.keywords,
+                [ids.get(t) for t in self.token_types],
+            ),
+        ) as pool:
+            chunks = pool.map(
+                _lex_chunk, starts, (text[a:b] for a, b in zip(starts, ends))
+            )
+            return self._stitch(text, types, chunks)
+
+    @staticmethod
+    def _split(text, chunk_size):
+        starts = [0]
+        while True:
+            newline = text.find("\n", starts[-1] + chunk_size)
+            if newline < 0 or newline + 1 == len(text):
+                return starts
+            starts.append(newline + 1)
+
+    def _stitch(self, text, types, chunks):
+        ids = {t: n for n, t in enumerate(types)}
+        buffer = TokenBuffer(text, types)
+        resume = 0
+        scan = None
+        pending = []
+
+        for kinds, offsets, lengths in chunks:
+            if not kinds:
+                continue
+
+            if scan is None:
+                scan = self._tokenize((text,), resume)
+            end = offsets[-1] + lengths[-1]
+
+            for scanned in chain(pending, scan):
+                pending = []
+                _, ttype, offset, _ = scanned
+                if ttype is None:
+                    continue
+                if offset >= end:
+                    # the sequential scan went past this chunk
+                    pending = [scanned]
+                    break
+                n = bisect_left(offsets, offset)
+                if n < len(offsets) and offsets[n] == offset:
+                    break
+                buffer.append(ids[ttype], offset, len(scanned[0]))
+
+            if pending:
+                continue
+
+            # the chunk agrees with the sequential scan from its n-th token on
+            buffer.kinds.extend(kinds[n:])
+            buffer.offsets.extend(offsets[n:])
+            buffer.lengths.extend(lengths[n:])
+            resume = end
+            scan = None
+
+        if scan is None:
+            scan = self._tokenize((text,), resume)
+        self._fill(buffer, ids, chain(pending, scan))
+        return buffer
+
+    def stream(self, source, chunk_size=1 << 16):
+        """
+        Lazily yields the tokens of `source`, a text or binary file object or
+        an `mmap`, reading `chunk_size` characters at a time. Binary sources
+        are decoded as UTF-8.
+        """
+
+        lines = LineIndex()
+        chunks = lines.feed(read_chunks(source, chunk_size))
+        return self._tokens(self._tokenize(chunks), lines)
+
+    def generate(self, path=None):
+        """
+        Returns the source of a standalone Python module that scans like this
+        lexer, and writes it to `path` if one is given.
+
+        The module only depends on the standard library: the table is encoded
+        as literal tuples, one per state and indexed by class, walked by a
+        single loop. Its `scan(text)` yields `(name, lex, offset)` for every
+        token, where `name` is the name of the token type or `ERROR` for runs
+        of characters no token matches, ending with the end of file.
+        `load_scanner` turns it back into a lexer over the terminals of a
+        grammar.
+        """
+
+        table = self.table
+        width = table.width
+        transitions = ",\n".join(
+            f"    {tuple(table.transitions[s * width : (s + 1) * width])!r}"
+            for s in range(table.states)
+        )
+        names = [t and t.name for t in self.token_types]
+        keywords = [
+            words and {word: names[n] for word, n in words.items()}
+            for words in self.keywords
+        ]
+
+        source = SCANNER_TEMPLATE.format(
+            boundaries=list(table.classes.boundaries),
+            ids=list(table.classes.ids),
+            transitions=transitions,
+            accepts=tuple(table.accepts),
+            start=table.start,
+            names=names,
+            keywords=keywords,
+            eof=self.eof.name,
+            error=ERROR.name,
+        )
+        if path is not None:
+            with open(path, "w", encoding="utf8") as f:
+                f.write(source)
+        return source
+
+
+class RegexLexer(Lexer):
+    """
+    A lexer that scans with Python's `re` engine instead of walking the
+    table. The kept rows of the token table are translated to `re` patterns
+    and joined in master patterns, an alternative per row in priority order:
+    one for every character a token starts with, holding the rows that may
+    start with it, which spares `re` from trying every row in turn.
+
+    `re` takes the first alternative that matches, so a match of a master
+    pattern is checked against the later rows in it, and the longest match
+    wins, ties going to the earliest row. Within a row, `re` may also stop
+    short of the longest match, as `=|==` does on `==`, so the rows for which
+    `longest_first` can't tell it won't are matched again with their
+    `Regex`, which finds where the longest match ends.
+
+    `re` doesn't tell how far it looked ahead, so every token is taken to
+    reach the end of the text, and streams are read whole before scanning.
+    There is no table either, so it can't lex in parallel or generate
+    scanner modules.
+    """
+
+    def __init__(self, table, eof, fold_keywords=True):
+        self.eof = eof
+        self.token_types = [token_type for token_type, _ in table]
+
+        def regex(n):
+            return compile_regex(table[n][1])
+
+        folded, keywords = (
+            self._fold_keywords(table, regex) if fold_keywords else (set(), {})
+        )
+        self.keywords = [keywords.get(n) for n in range(len(table))]
+
+        # alternatives are kept in the order they are written, which is the
+        # order `re` tries them in, and rows never match the empty string, as
+        # in the table
+        self.patterns = {}
+        self.first = {}
+        self.exact = {}
+        for n in range(len(table)):
+            if n in folded:
+                continue
+            ast = compile_regex(table[n][1], simplify=False).ast
+            self.patterns[n] = translate(ast, nonempty=True)
+            if not longest_first(ast):
+                self.exact[n] = regex(n)
+
+            labels = []
+            _, first, _ = ast.positions(labels, [])
+            self.first[n] = CharSet(
+                [interval for p in first for interval in label_intervals(labels[p])]
+            )
+        self.masters = {}
+
+    def parallel(self, text, workers=None, chunk_size=1 << 22):
+        raise NotImplementedError("the re backend can't lex in parallel")
+
+    def generate(self, path=None):
+        raise NotImplementedError("the re backend can't generate scanner modules")
+
+    def _master(self, char):
+        """
+        Returns the master pattern of the rows that may start with `char`,
+        `None` if there are none, the row of each of its groups and, for each
+        of those rows, the `(row, pattern)` pairs of the later rows in it.
+        """
+
+        rows = [n for n, first in self.first.items() if char in first]
+        patterns = [(n, re.compile(self.patterns[n])) for n in rows]
+        master = "|".join(f"({self.patterns[n]})" for n in rows)
+
+        # translated rows have no groups of their own, and group 0 is the
+        # whole match
+        groups = [-1] + rows
+        rivals = {n: patterns[m + 1 :] for m, n in enumerate(rows)}
+        self.masters[char] = master = (
+            re.compile(master) if rows else None,
+            groups,
+            rivals,
+        )
+        return master
+
+    def _skip(self, text, start, stop):
+        masters = self.masters
+        for index in range(start + 1, len(text)):
+            try:
+                master = masters[text[index]][0]
+            except KeyError:
+                master = self._master(text[index])[0]
+            if master and master.match(text, index):
+                return index, stop
+        return len(text), stop
+
+    def _tokenize(self, chunks, start=0):
+        token_types = self.token_types
+        keywords = self.keywords
+        masters = self.masters
+        exact = self.exact
+
+        text = "".join(chunks)
+        size = len(text)
+        index = start
+        while index < size:
+            try:
+                master, groups, rivals = masters[text[index]]
+            except KeyError:
+                master, groups, rivals = self._master(text[index])
+
+            match = master and master.match(text, index)
+            if match:
+                final = groups[match.lastindex]
+                end = match.end()
+                if final in exact:
+                    end = exact[final].match(text, index)[1]
+                for n, pattern in rivals[final]:
+                    rival = pattern.match(text, index)
+                    if rival is None:
+                        continue
+                    stop = exact[n].match(text, index)[1] if n in exact else rival.end()
+                    if stop > end:
+                        final, end = n, stop
+
+                lex = text[index:end]
+                words = keywords[final]
+                ttype = token_types[final if words is None else words.get(lex, final)]
+            else:
+                end, _ = self._skip(text, index, size)
+                lex = text[index:end]
+                ttype = ERROR
+            yield lex, ttype, index, size
+            index = end
+
+        yield self.eof.name, self.eof, index, index
+
+
+def lexical_errors(tokens, errors: list[str]):
+    """
+    Yields the valid tokens of `tokens` and appends a message to `errors` for
+    every error token, so a source is lexed to the end whatever it holds.
+    """
+
+    for token in tokens:
+        if token.is_valid:
+            yield token
+        else:
+            line, column = token.position
+            errors.append(
+                f"Unexpected characters: {token.lex!r} at line: {line}, "
+                f"column: {column}"
+            )
+
+
+def check_lexers(expected, actual, sources):
+    """
+    Lexes every one of `sources` with both lexers and returns, for each
+    source they disagree on, its index, the index of the first differing
+    token and both tokens, `None` standing for a missing token. Tokens are
+    compared by lexeme, type, position and offset.
+    """
+
+    def fields(token):
+        return token and (token.lex, token.token_type, token.position, token.offset)
+
+    mismatches = []
+    for n, source in enumerate(sources):
+        pairs = zip_longest(expected(source), actual(source))
+        for m, (a, b) in enumerate(pairs):
+            if fields(a) != fields(b):
+                mismatches.append((n, m, a, b))
+                break
+    return mismatches
+
+
+_worker = None
+
+
+def _init_worker(table, keywords, kinds):
+    global _worker
+
+    # a lexer without grammar symbols: tokens are tagged with the ids of their
+    # types in a `TokenBuffer`
+    _worker = Lexer.__new__(Lexer)
+    _worker.table = table
+    _worker.keywords = keywords
+    _worker.token_types = kinds
+    _worker.eof = EOF(None)
+
+
+def _lex_chunk(start, text):
+    """
+    Lexes a chunk of a source that starts at offset `start`. Only the tokens
+    whose matches never reached the end of the chunk are kept, since the rest
+    may change with the text that follows. They are sent back as the columns
+    of a `TokenBuffer`, type ids, offsets and lengths, which are much cheaper
+    to pickle than tokens.
+    """
+
+    # a chunk may start inside a string or a comment, and then its first
+    # tokens are wrong, errors included, until stitching finds where the
+    # sequential scan agrees with it
+    fields = tuple(array("I") for _ in range(3))
+    kinds, offsets, lengths = fields
+    for lex, kind, offset, stop in _worker._tokenize((text,)):
+        if stop >= len(text):
+            break
+        if kind is not None:
+            # errors are the first type of a buffer
+            kinds.append(0 if kind is ERROR else kind)
+            offsets.append(start + offset)
+            lengths.append(len(lex))
+    return fields
+
+
+def read_chunks(source, size):
+    decoder = None
+    while True:
+        chunk = source.read(size)
+        if not chunk:
+            break
+        if not isinstance(chunk, str):
+            if decoder is None:
+                decoder = codecs.getincrementaldecoder("utf8")()
+            chunk = decoder.decode(chunk)
+        if chunk:
+            yield chunk
+
+    if decoder is not None:
+        chunk = decoder.decode(b"", final=True)
+        if chunk:
+            yield chunk
+
+
+SCANNER_TEMPLATE = '''"""
+HULK scanner generated by `bruce.tools.lexer.Lexer.generate`. Do not edit.
+"""
+
+from bisect import bisect_right
+
+
+BOUNDARIES = {boundaries!r}
+IDS = {ids!r}
+
+TRANSITIONS = (
+{transitions},
+)
+ACCEPTS = {accepts!r}
+START = {start!r}
+
+NAMES = {names!r}
+KEYWORDS = {keywords!r}
+EOF = {eof!r}
+ERROR = {error!r}
+
+
+class Classes(dict):
+    def __missing__(self, char):
+        index = bisect_right(BOUNDARIES, ord(char)) - 1
+        self[char] = c = IDS[index] if index >= 0 else 0
+        return c
+
+
+CLASSES = Classes()
+
+
+def longest(text, index):
+    state = START
+    final = -1
+    for position in range(index, len(text)):
+        state = TRANSITIONS[state][CLASSES[text[position]]]
+        if state < 0:
+            break
+        if ACCEPTS[state] >= 0:
+            final = ACCEPTS[state]
+    return final
+
+
+def skip(text, start):
+    viable = TRANSITIONS[START]
+    for index in range(start + 1, len(text)):
+        if viable[CLASSES[text[index]]] >= 0 and longest(text, index) >= 0:
+            return index
+    return len(text)
+
+
+def scan(text):
+    transitions = TRANSITIONS
+    accepts = ACCEPTS
+    classes = CLASSES
+    size = len(text)
+
+    index = 0
+    while index < size:
+        state = START
+        final = -1
+        end = index
+        for position in range(index, size):
+            state = transitions[state][classes[text[position]]]
+            if state < 0:
+                break
+            row = accepts[state]
+            if row >= 0:
+                final = row
+                end = position + 1
+
+        if final < 0:
+            end = skip(text, index)
+            yield ERROR, text[index:end], index
+            index = end
+            continue
+
+        lex = text[index:end]
+        words = KEYWORDS[final]
+        name = NAMES[final] if words is None else words.get(lex, NAMES[final])
+        if name is not None:
+            yield name, lex, index
+        index = end
+
+    yield EOF, EOF, index
+'''
+
+
+def load_scanner(module, grammar):
+    """
+    Returns a lexer over a module written by `Lexer.generate`, whose tokens
+    have the terminals of `grammar` with the names the module yields.
+    """
+
+    symbols = grammar.symbol_dict
+
+    def lexer(text):
+        lines = LineIndex(text)
+        return [
+            (
+                ErrorToken(lex, ERROR, offset, None, lines)
+                if name == module.ERROR
+                else Token(lex, symbols[name], offset, None, lines)
+            )
+            for name, lex, offset in module.scan(text)
+        ]
+
+    return lexer
+
 
-def create_lexer(table: list[tuple[Terminal, str]], eof: EOF):
-    l = Lexer(table, eof)
-    return lambda text: l(text)
+def create_lexer(
+    table: list[tuple[Terminal, str]], eof: EOF, cache=True, backend="dfa"
+):
+    if backend == "re":
+        return RegexLexer(table, eof)
+    return Lexer(table, eof, cache)
 
 
 def keyword_row(tm: Terminal):
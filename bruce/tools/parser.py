@@ -1,7 +1,14 @@
+from collections.abc import Iterable, Iterator
 from itertools import islice
+from weakref import WeakKeyDictionary
 
 from .grammar import Symbol, Sentence, Grammar, NonTerminal, Terminal, Production, EOF
 from .token import Token
+from . import cache as disk_cache
+
+
+# Bump whenever the construction or the layout of cached parsing tables changes.
+PARSING_TABLE_VERSION = 1
 
 
 class ParsingError(Exception):
@@ -213,40 +220,133 @@ def build_parsing_table(
     return M
 
 
+def grammar_fingerprint(G: Grammar) -> str:
+    """
+    Hash of the symbols and productions of `G`, which are all its parsing
+    table depends on. Attributes are left out.
+    """
+
+    return disk_cache.fingerprint(
+        PARSING_TABLE_VERSION,
+        G.start_symbol.name,
+        [t.name for t in G.terminals],
+        [nt.name for nt in G.non_terminals],
+        [(p.left.name, [s.name for s in p.right]) for p in G.productions],
+    )
+
+
+# tables by grammar, along with the number of productions they were built
+# from, since a grammar may still grow after its table is asked for
+_tables: WeakKeyDictionary[
+    Grammar, tuple[int, dict[tuple[NonTerminal, Terminal], Production]]
+] = WeakKeyDictionary()
+
+
+def parsing_table(G: Grammar, cache=True):
+    """
+    Returns the LL(1) parsing table of `G`, building it only once per process
+    for every grammar. Unless `cache=False`, tables are also kept in the
+    on-disk cache under the fingerprint of their grammar, so other processes
+    only load them. They are stored as the indexes of their productions.
+    """
+
+    try:
+        size, M = _tables[G]
+        if size == len(G.productions):
+            return M
+    except KeyError:
+        pass
+
+    key = grammar_fingerprint(G)
+    M = load_parsing_table(G, disk_cache.load("parser", key)) if cache else None
+    if M is None:
+        firsts = compute_firsts(G)
+        M = build_parsing_table(G, firsts, compute_follows(G, firsts))
+        if cache:
+            numbers = {id(p): n for n, p in enumerate(G.productions)}
+            entries = [
+                (X.name, t.name, [numbers[id(p)] for p in productions])
+                for (X, t), productions in M.items()
+            ]
+            disk_cache.store("parser", key, entries)
+
+    _tables[G] = len(G.productions), M
+    return M
+
+
+def load_parsing_table(G: Grammar, entries):
+    """
+    Rebuilds a parsing table of `G` from its entries in the on-disk cache.
+    Returns `None` if there are none or they don't fit `G`: every entry must
+    pair a non-terminal with a terminal and only hold productions of that
+    non-terminal.
+    """
+
+    if entries is None:
+        return None
+
+    symbols = G.symbol_dict
+    productions = G.productions
+    M = {}
+    try:
+        for X, t, numbers in entries:
+            X, t = symbols[X], symbols[t]
+            if not isinstance(X, NonTerminal) or not isinstance(t, Terminal):
+                return None
+            row = M[X, t] = []
+            for n in numbers:
+                if not isinstance(n, int) or not 0 <= n < len(productions):
+                    return None
+                if productions[n].left is not X:
+                    return None
+                row.append(productions[n])
+    except (KeyError, TypeError, ValueError):
+        return None
+    return M
+
+
 def create_parser(
     G: Grammar,
     M: dict[tuple[NonTerminal, Terminal], Production] | None = None,
     firsts: dict[Symbol, ContainerSet] | None = None,
     follows: dict[NonTerminal, ContainerSet] | None = None,
+    lazy=False,
 ):
-    if M is None:
+    """
+    Returns an LL(1) parser for `G`. The parser takes any iterable of tokens
+    ending with EOF and reads it with one token of lookahead. It returns the
+    left parse as a list, or as a generator if `lazy` is set, so tokens and
+    productions can be consumed as they are produced. Unless its firsts or
+    follows are given, the table of `G` comes from `parsing_table`.
+    """
+
+    if M is None and firsts is None and follows is None:
+        M = parsing_table(G)
+    elif M is None:
         if firsts is None:
             firsts = compute_firsts(G)
         if follows is None:
             follows = compute_follows(G, firsts)
         M = build_parsing_table(G, firsts, follows)
 
-    def parser(tokens: list[Token]) -> list[Production]:
-        token_types = []
-
-        for t in tokens:
-            token_types.append(t.token_type)
+    def left_parse(tokens: Iterable[Token]) -> Iterator[Production]:
+        tokens = iter(tokens)
+        lookahead = next(tokens)
 
-        cursor = 0
         try:
-            M[G.start_symbol, token_types[cursor]][0]
+            M[G.start_symbol, lookahead.token_type][0]
         except KeyError:
-            t = tokens[cursor]
+            t = lookahead
             raise UnexpectedToken(t.lex, None, t.position[0], t.position[1])
         else:
-            p = M[G.start_symbol, token_types[cursor]][0]
-        output = [p]
+            p = M[G.start_symbol, lookahead.token_type][0]
+        yield p
         stack = [*reversed(p.right)]
 
         while True:
             top = stack.pop()
-            a = token_types[cursor]
-            current_token = tokens[cursor]
+            a = lookahead.token_type
+            current_token = lookahead
 
             if top.is_non_terminal:
                 try:
@@ -260,14 +360,14 @@ def create_parser(
                     )
                 else:
                     p = M[top, a][0]
-                output.append(p)
+                yield p
                 if not p.is_epsilon:
                     stack.extend(reversed(p.right))
             else:
                 if top == G.EOF:
                     break
                 if top == a:
-                    cursor += 1
+                    lookahead = next(tokens)
                 else:
                     # TODO: use our own errors
                     raise UnexpectedToken(
@@ -278,18 +378,22 @@ def create_parser(
                     )
 
             if not stack:
-                if cursor < len(tokens) - 1:
+                if lookahead.token_type != G.EOF:
                     raise UnexpectedToken(
                         current_token.lex, None, current_token.position[0]
                     )
                 break
 
-        return output
+    if lazy:
+        return left_parse
+
+    def parser(tokens: Iterable[Token]) -> list[Production]:
+        return list(left_parse(tokens))
 
     return parser
 
 
-def evaluate_parse(left_parse: list[Production], tokens: list[Token]):
+def evaluate_parse(left_parse: Iterable[Production], tokens: Iterable[Token]):
     if not left_parse or not tokens:
         return
 
@@ -297,6 +401,10 @@ def evaluate_parse(left_parse: list[Production], tokens: list[Token]):
     tokens = iter(tokens)
     result = evaluate(next(left_parse), left_parse, tokens)
 
+    # a lazy left parse only checks for trailing tokens once it is advanced
+    # past its last production
+    for production in left_parse:
+        raise ParsingError(f"Unexpected production: {production}")
     assert isinstance(next(tokens).token_type, EOF)
     return result
 
@@ -1,8 +1,13 @@
+from collections import OrderedDict, namedtuple
+from functools import cache, cached_property
+
+from .. import cache as disk_cache
 from ..grammar import Grammar, Terminal
 from ..parser import evaluate_parse, create_parser
 from ..token import Token
-from .automata import nfa_to_dfa
+from .automata import LazyDFA, nfa_to_dfa, automata_minimization
 from . import ast
+from .simplify import simplify as simplify_ast
 
 
 GRAMMAR = Grammar()
@@ -13,6 +18,7 @@ pipe = GRAMMAR.add_terminal("|")
 star, question = GRAMMAR.add_terminals("* ?")
 lparen, rparen = GRAMMAR.add_terminals("( )")
 symbol, range_t = GRAMMAR.add_terminals("s -")
+char_class = GRAMMAR.add_terminal("[]")
 
 # endregion
 
@@ -62,6 +68,12 @@ Atom %= (
     lambda h, s: s[1],
     lambda h, s: s[2],
 )
+Atom %= (
+    char_class + Quantifier,
+    lambda h, s: s[2],
+    None,
+    lambda h, s: ast.CharSetNode.parse(s[1]),
+)
 
 Range %= range_t + symbol, lambda h, s: ast.RangeNode(h[0], s[2])
 Range %= GRAMMAR.Epsilon, lambda h, s: ast.SymbolNode(h[0])
@@ -83,7 +95,10 @@ Quantifier %= GRAMMAR.Epsilon, lambda h, s: h[0]
 
 # endregion
 
-parser = create_parser(GRAMMAR)
+
+@cache
+def get_parser():
+    return create_parser(GRAMMAR)
 
 
 def regex_tokenizer(text: str, G: Grammar, char_terminal: Terminal):
@@ -91,12 +106,24 @@ def regex_tokenizer(text: str, G: Grammar, char_terminal: Terminal):
     fixed_chars = [t.name for t in G.terminals if t != char_terminal]
 
     scaping = False
-    for char in text:
+    chars = iter(text)
+    for char in chars:
         if scaping:
             tokens.append(Token(char, char_terminal))
             scaping = False
         elif char == "\\":
             scaping = True
+        elif char == "[":
+            # the whole class is a single token, parsed by its AST node
+            body = []
+            for char in chars:
+                if char == "]" and not scaping:
+                    break
+                scaping = char == "\\" and not scaping
+                body.append(char)
+            else:
+                raise Exception(f"Unterminated character class: {text}")
+            tokens.append(Token("".join(body), char_class))
         else:
             tokens.append(
                 Token(
@@ -108,13 +135,233 @@ def regex_tokenizer(text: str, G: Grammar, char_terminal: Terminal):
     return tokens
 
 
+def literals(text: str) -> list[str] | None:
+    """
+    Returns the strings matched by `text` if it is a literal or an
+    alternation of literals, like `let` or `sin|cos`, else `None`.
+    """
+
+    words = [""]
+    for token in regex_tokenizer(text, GRAMMAR, symbol)[:-1]:
+        if token.token_type == symbol:
+            words[-1] += token.lex
+        elif token.token_type == pipe:
+            words.append("")
+        else:
+            return None
+
+    return None if "" in words else words
+
+
 class Regex:
-    def __init__(self, text):
+    """
+    A compiled regex.
+
+    Matching runs on a lazy DFA whose states are built as scans reach them,
+    at most `max_states` of them being kept, so compiling a regex is linear
+    in its size whatever its DFA looks like. The full DFA, `automaton`, is
+    only built when it is first used, through a Thompson NFA and subset
+    construction or, with `direct=True`, straight from the followpos sets of
+    the regex AST. Unless `simplify=False`, the AST is normalized first (see
+    `simplify`).
+    """
+
+    def __init__(
+        self, text, minimize=True, direct=False, max_states=1024, simplify=True
+    ):
         tokens = regex_tokenizer(text, GRAMMAR, symbol)
-        left_parse = parser([token for token in tokens])
-        ast = evaluate_parse(left_parse, tokens)
-        nfa = ast.evaluate()
-        self.automaton = nfa_to_dfa(nfa)
+        left_parse = get_parser()([token for token in tokens])
+        self.ast = evaluate_parse(left_parse, tokens)
+        if simplify:
+            self.ast = simplify_ast(self.ast)
+        self.minimize = minimize
+        self.direct = direct
+        self.max_states = max_states
+
+    @cached_property
+    def nfa(self):
+        return self.ast.evaluate()
+
+    @cached_property
+    def matcher(self):
+        return LazyDFA(self.nfa, self.max_states)
+
+    @cached_property
+    def automaton(self):
+        automaton = self.ast.to_dfa() if self.direct else nfa_to_dfa(self.nfa)
+        if self.minimize:
+            automaton = automata_minimization(automaton)
+        return automaton
+
+    def __call__(self, text):
+        text = as_buffer(text)
+        return self.matcher.longest(text) == len(text)
+
+    def search(self, text, pos=0, endpos=None):
+        """
+        Returns the `(start, end)` span of the leftmost longest match in
+        `text[pos:endpos]`, or `None` if there is none.
+        """
+
+        text = as_buffer(text)
+        pos, endpos = bounds(text, pos, endpos)
+        matcher = self.matcher
+        classes = matcher.classes
+        first = matcher.first
+        empty = not matcher.finals.isdisjoint(matcher.start)
+
+        for start in range(pos, endpos):
+            if empty or classes[text[start]] in first:
+                end = matcher.longest(text, start, endpos)
+                if end >= 0:
+                    return start, end
+
+        return (endpos, endpos) if empty and pos <= endpos else None
+
+    def match(self, text, pos=0, endpos=None):
+        """
+        Returns the `(start, end)` span of the longest match at `pos`, or
+        `None` if there is none.
+        """
+
+        text = as_buffer(text)
+        pos, endpos = bounds(text, pos, endpos)
+        if endpos < pos:
+            return None
+        end = self.matcher.longest(text, pos, endpos)
+        return None if end < 0 else (pos, end)
+
+    def finditer(self, text, pos=0, endpos=None):
+        """
+        Yields the spans of the leftmost longest matches in `text[pos:endpos]`
+        that don't overlap, from left to right. An empty match is never
+        yielded at the position the previous empty match was found at.
+        """
+
+        text = as_buffer(text)
+        pos, endpos = bounds(text, pos, endpos)
+        while pos <= endpos:
+            span = self.search(text, pos, endpos)
+            if span is None:
+                return
+            yield span
+            start, pos = span
+            if start == pos:
+                pos += 1
+
+    def findall(self, text, pos=0, endpos=None):
+        """
+        Returns the slices of `text` that `finditer` matches.
+        """
+
+        text = as_buffer(text)
+        return [text[start:end] for start, end in self.finditer(text, pos, endpos)]
+
+    def split(self, text, maxsplit=0):
+        """
+        Returns the slices of `text` between the matches of the regex, at
+        most `maxsplit` of them being used if `maxsplit` is not `0`.
+        """
+
+        text = as_buffer(text)
+        pieces = []
+        last = 0
+        for n, (start, end) in enumerate(self.finditer(text), 1):
+            pieces.append(text[last:start])
+            last = end
+            if n == maxsplit:
+                break
+        pieces.append(text[last:])
+        return pieces
+
+
+# Bump whenever the construction of the automata stored on disk changes.
+CACHE_FORMAT_VERSION = 1
+
+CacheInfo = namedtuple("CacheInfo", "hits misses disk_hits maxsize currsize")
+
+_compiled = OrderedDict()
+_maxsize = 512
+_hits = _misses = _disk_hits = 0
+
+
+def compile(
+    text, minimize=True, direct=False, max_states=1024, disk=False, simplify=True
+):
+    """
+    Returns the `Regex` of `text` with the given options, compiling it only
+    the first time: compiled regexes are kept in a process-wide LRU cache of
+    `set_cache_size` entries. With `disk=True` their DFAs are built right
+    away and also kept in the on-disk cache, so other processes only load
+    them.
+    """
+
+    global _hits, _misses, _disk_hits
+
+    key = (text, minimize, direct, max_states, simplify)
+    try:
+        regex = _compiled[key]
+    except KeyError:
+        _misses += 1
+        regex = Regex(text, minimize, direct, max_states, simplify)
+    else:
+        _hits += 1
+        _compiled.move_to_end(key)
+
+    if disk and "automaton" not in regex.__dict__:
+        fingerprint = disk_cache.fingerprint(
+            CACHE_FORMAT_VERSION, text, minimize, direct, simplify
+        )
+        automaton = disk_cache.load("regex", fingerprint)
+        if automaton is None:
+            disk_cache.store("regex", fingerprint, regex.automaton)
+        else:
+            _disk_hits += 1
+            regex.automaton = automaton
+
+    _compiled[key] = regex
+    if len(_compiled) > _maxsize:
+        _compiled.popitem(last=False)
+    return regex
+
+
+def cache_info():
+    return CacheInfo(_hits, _misses, _disk_hits, _maxsize, len(_compiled))
+
+
+def cache_clear():
+    global _hits, _misses, _disk_hits
+
+    _compiled.clear()
+    _hits = _misses = _disk_hits = 0
+
+
+def set_cache_size(maxsize: int):
+    global _maxsize
+
+    _maxsize = maxsize
+    while len(_compiled) > _maxsize:
+        _compiled.popitem(last=False)
+
+
+def bounds(text, pos, endpos):
+    """
+    Clamps `pos` and `endpos` to the offsets of `text`, as `re` does.
+    """
+
+    size = len(text)
+    pos = min(max(pos, 0), size)
+    endpos = size if endpos is None else min(max(endpos, 0), size)
+    return pos, endpos
+
+
+def as_buffer(text):
+    """
+    Makes `text` indexable by character: strings are indexed by character
+    and `bytes`, `bytearray` and `mmap` objects by byte. Memory views are cast
+    to views of bytes, without copying.
+    """
 
-    def __call__(self, text: str):
-        return self.automaton.recognize(text)
+    if isinstance(text, memoryview) and (text.format != "B" or text.ndim != 1):
+        return text.cast("B")
+    return text
@@ -1,16 +1,42 @@
-from .automata import NFA, DFA, nfa_to_dfa
-from .automata import (
-    automata_union,
-    automata_concatenation,
-    automata_closure,
-    automata_minimization,
-)
+from .automata import NFA, DFA, CharSet, NFABuilder, nfa_to_dfa, positions_to_dfa
 
 EPSILON = "ε"
 
 
 class Node:
     def evaluate(self):
+        builder = NFABuilder()
+        return builder.build(self.build(builder))
+
+    def build(self, builder):
+        raise NotImplementedError()
+
+    def to_dfa(self):
+        """
+        Builds the DFA of the regex directly from its positions, without an
+        intermediate NFA.
+        """
+
+        labels = []
+        followpos = []
+        nullable, first, last = self.positions(labels, followpos)
+
+        # the end marker follows the whole regex
+        end = len(labels)
+        labels.append(None)
+        followpos.append(set())
+        for position in last:
+            followpos[position].add(end)
+
+        return positions_to_dfa(labels, followpos, first | {end} if nullable else first)
+
+    def positions(self, labels, followpos):
+        """
+        Numbers the leaves of the subtree in `labels` and fills their
+        `followpos`. Returns whether the subtree is nullable and its first
+        and last positions.
+        """
+
         raise NotImplementedError()
 
 
@@ -23,12 +49,20 @@ class UnaryNode(Node):
     def __init__(self, node):
         self.node = node
 
-    def evaluate(self):
-        value = self.node.evaluate()
-        return self.operate(value)
+    def build(self, builder):
+        value = self.node.build(builder)
+        return self.operate(builder, value)
+
+    def positions(self, labels, followpos):
+        value = self.node.positions(labels, followpos)
+        return self.follow(followpos, value)
 
     @staticmethod
-    def operate(value):
+    def operate(builder, value):
+        raise NotImplementedError()
+
+    @staticmethod
+    def follow(followpos, value):
         raise NotImplementedError()
 
 
@@ -37,71 +71,160 @@ class BinaryNode(Node):
         self.left = left
         self.right = right
 
-    def evaluate(self):
-        lvalue = self.left.evaluate()
-        rvalue = self.right.evaluate()
-        return self.operate(lvalue, rvalue)
+    def build(self, builder):
+        lvalue = self.left.build(builder)
+        rvalue = self.right.build(builder)
+        return self.operate(builder, lvalue, rvalue)
+
+    def positions(self, labels, followpos):
+        lvalue = self.left.positions(labels, followpos)
+        rvalue = self.right.positions(labels, followpos)
+        return self.follow(followpos, lvalue, rvalue)
 
     @staticmethod
-    def operate(lvalue, rvalue):
+    def operate(builder, lvalue, rvalue):
         raise NotImplementedError()
 
+    @staticmethod
+    def follow(followpos, lvalue, rvalue):
+        raise NotImplementedError()
+
+
+def operands(node, kind):
+    """
+    Returns the operands of a tree of `kind` nodes, from left to right.
+    """
+
+    result = []
+    pending = [node]
+    while pending:
+        node = pending.pop()
+        if isinstance(node, kind):
+            pending.append(node.right)
+            pending.append(node.left)
+        else:
+            result.append(node)
+    return result
+
 
 class EpsilonNode(Node):
-    def evaluate(self):
-        return NFA(1, [0], {})
+    def build(self, builder):
+        return builder.epsilon()
+
+    def positions(self, labels, followpos):
+        return True, set(), set()
+
+
+def leaf_positions(label, labels, followpos):
+    position = len(labels)
+    labels.append(label)
+    followpos.append(set())
+    return False, {position}, {position}
 
 
 class SymbolNode(AtomicNode):
-    def evaluate(self):
-        s = self.lex
-        return NFA(2, [1], {(0, s): [1]})
+    def build(self, builder):
+        return builder.symbol(self.lex)
+
+    def positions(self, labels, followpos):
+        return leaf_positions(self.lex, labels, followpos)
 
 
 class ClosureNode(UnaryNode):
     @staticmethod
-    def operate(value):
-        return automata_closure(value)
+    def operate(builder, value):
+        return builder.closure(value)
+
+    @staticmethod
+    def follow(followpos, value):
+        _, first, last = value
+        for position in last:
+            followpos[position] |= first
+        return True, first, last
 
 
 class UnionNode(BinaryNode):
-    @staticmethod
-    def operate(lvalue, rvalue):
-        return automata_union(lvalue, rvalue)
+    def build(self, builder):
+        # nested unions share a single start and final state
+        fragments = [node.build(builder) for node in operands(self, UnionNode)]
+        return builder.union(*fragments)
 
+    @staticmethod
+    def operate(builder, lvalue, rvalue):
+        return builder.union(lvalue, rvalue)
 
-class ConcatNode(BinaryNode):
     @staticmethod
-    def operate(lvalue, rvalue):
-        return automata_concatenation(lvalue, rvalue)
+    def follow(followpos, lvalue, rvalue):
+        lnullable, lfirst, llast = lvalue
+        rnullable, rfirst, rlast = rvalue
+        return lnullable or rnullable, lfirst | rfirst, llast | rlast
 
 
-class RangeNode(Node):
-    # first char: \x00
-    # last char: \x7f
-    # '"' is between '!' and '#'
-    ASCII = "".join([chr(i) for i in range(128)])
+class ConcatNode(BinaryNode):
+    @staticmethod
+    def operate(builder, lvalue, rvalue):
+        return builder.concatenation(lvalue, rvalue)
 
-    def __init__(self, lower, upper):
-        self.lower: str = lower
-        self.upper: str = upper
+    @staticmethod
+    def follow(followpos, lvalue, rvalue):
+        lnullable, lfirst, llast = lvalue
+        rnullable, rfirst, rlast = rvalue
+        for position in llast:
+            followpos[position] |= rfirst
+        return (
+            lnullable and rnullable,
+            lfirst | rfirst if lnullable else lfirst,
+            llast | rlast if rnullable else rlast,
+        )
 
-    def evaluate(self):
-        chars: str | None = None
 
-        try:
-            li = self.ASCII.index(self.lower)
-            ui = self.ASCII.index(self.upper)
-            if ui >= li:
-                chars = self.ASCII[li : ui + 1]
-        except:
-            pass
+class CharSetNode(Node):
+    def __init__(self, chars: CharSet):
+        self.chars = chars
 
-        if chars is None:
-            raise Exception(f"Invalid range: {(self.lower, self.upper)}")
+    def build(self, builder):
+        # a single transition labeled with the whole set
+        return builder.symbol(self.chars)
 
-        node = SymbolNode(chars[0])
-        for ch in chars[1:]:
-            node = UnionNode(node, SymbolNode(ch))
+    def positions(self, labels, followpos):
+        return leaf_positions(self.chars, labels, followpos)
 
-        return node.evaluate()
+    @staticmethod
+    def parse(text: str):
+        """
+        Parses the inside of a `[...]` class: characters and `a-z` ranges,
+        with `\\` escaping the next character. A leading `^` negates it.
+        """
+
+        negated = text.startswith("^")
+        if negated:
+            text = text[1:]
+
+        # (char, escaped) pairs, since an escaped `-` is not a range
+        items = []
+        chars = iter(text)
+        for char in chars:
+            if char == "\\":
+                items.append((next(chars, "\\"), True))
+            else:
+                items.append((char, False))
+
+        intervals = []
+        i = 0
+        while i < len(items):
+            lower = items[i][0]
+            if i + 2 < len(items) and items[i + 1] == ("-", False):
+                upper = items[i + 2][0]
+                i += 3
+            else:
+                upper = lower
+                i += 1
+            intervals.extend(CharSet.range(lower, upper).intervals)
+
+        chars = CharSet(intervals)
+        return CharSetNode(chars.complement() if negated else chars)
+
+
+class RangeNode(CharSetNode):
+    def __init__(self, lower: str, upper: str):
+        super().__init__(CharSet.range(lower, upper))
@@ -1,3 +1,9 @@
+import sys
+from array import array
+from collections import OrderedDict
+from functools import cached_property
+from bisect import bisect_left, bisect_right
+
 from ..parser import ContainerSet
 
 
@@ -107,11 +113,24 @@ class State:
         return any(s.final for s in states)
 
     def to_deterministic(self, formatter=lambda x: str(x)):
-        closure = self.epsilon_closure
+        # epsilon closures are computed once per NFA state and DFA states are
+        # looked up by the NFA states they are made of
+        epsilon_closures = {}
+
+        def epsilon_closure(states):
+            closure = set()
+            for s in states:
+                try:
+                    closure |= epsilon_closures[s]
+                except KeyError:
+                    epsilon_closures[s] = frozenset(self.epsilon_closure_by_state(s))
+                    closure |= epsilon_closures[s]
+            return frozenset(closure)
+
+        closure = epsilon_closure([self])
         start = State(tuple(closure), any(s.final for s in closure), formatter)
 
-        closures = [closure]
-        states = [start]
+        states = {closure: start}
         pending = [start]
 
         while pending:
@@ -120,18 +139,15 @@ class State:
 
             for symbol in symbols:
                 move = self.move_by_state(symbol, *state.state)
-                closure = self.epsilon_closure_by_state(*move)
+                closure = epsilon_closure(move)
 
-                if closure not in closures:
-                    new_state = State(
+                try:
+                    new_state = states[closure]
+                except KeyError:
+                    new_state = states[closure] = State(
                         tuple(closure), any(s.final for s in closure), formatter
                     )
-                    closures.append(closure)
-                    states.append(new_state)
                     pending.append(new_state)
-                else:
-                    index = closures.index(closure)
-                    new_state = states[index]
 
                 state.add_transition(symbol, new_state)
 
@@ -235,6 +251,305 @@ class State:
         return self.graph().write_svg(fname)
 
 
+class ClassMap(dict):
+    """
+    Maps characters to alphabet class ids.
+
+    Classes are defined over code point intervals: `boundaries` holds the
+    first code point of every interval in ascending order and `ids` the class
+    of each one. Code points before the first boundary belong to class `0`,
+    the class of the symbols no transition is defined for. A character is
+    resolved by bisection the first time it is looked up and cached after
+    that, so classes can span ranges of any width. Characters may also be
+    given as code points, as when indexing `bytes`.
+    """
+
+    def __init__(self, boundaries=(), ids=()):
+        super().__init__()
+        self.boundaries = list(boundaries)
+        self.ids = list(ids)
+
+    @property
+    def size(self):
+        return max(self.ids, default=0) + 1
+
+    def class_of(self, code_point):
+        index = bisect_right(self.boundaries, code_point) - 1
+        return self.ids[index] if index >= 0 else 0
+
+    def __missing__(self, char):
+        # bytes are indexed as ints, which are taken as Latin-1 code points
+        self[char] = c = self.class_of(char if isinstance(char, int) else ord(char))
+        return c
+
+    def __reduce__(self):
+        return ClassMap, (self.boundaries, self.ids)
+
+
+class CharSet:
+    """
+    Set of characters kept as sorted, disjoint code point intervals, inclusive
+    at both ends. Used as a transition label matching any of its characters,
+    so a character class costs a single transition however wide it is.
+    """
+
+    __slots__ = ("intervals",)
+
+    def __init__(self, intervals=()):
+        merged = []
+        for lo, hi in sorted(intervals):
+            if merged and lo <= merged[-1][1] + 1:
+                merged[-1][1] = max(merged[-1][1], hi)
+            else:
+                merged.append([lo, hi])
+        self.intervals = tuple((lo, hi) for lo, hi in merged)
+
+    @staticmethod
+    def range(lower: str, upper: str):
+        if ord(lower) > ord(upper):
+            raise Exception(f"Invalid range: {(lower, upper)}")
+        return CharSet([(ord(lower), ord(upper))])
+
+    def complement(self):
+        intervals = []
+        lo = 0
+        for start, end in self.intervals:
+            if start > lo:
+                intervals.append((lo, start - 1))
+            lo = end + 1
+        if lo <= sys.maxunicode:
+            intervals.append((lo, sys.maxunicode))
+        return CharSet(intervals)
+
+    def __or__(self, other):
+        return CharSet(self.intervals + other.intervals)
+
+    def __contains__(self, char):
+        code_point = ord(char)
+        index = bisect_right(self.intervals, (code_point, sys.maxunicode)) - 1
+        return index >= 0 and self.intervals[index][1] >= code_point
+
+    def __eq__(self, other):
+        return isinstance(other, CharSet) and self.intervals == other.intervals
+
+    def __hash__(self):
+        return hash(self.intervals)
+
+    def __repr__(self):
+        return f"CharSet({list(self.intervals)})"
+
+
+def label_intervals(label):
+    """
+    Code point intervals, inclusive at both ends, matched by a label: a
+    single character, a `CharSet` or a set of characters.
+    """
+
+    if isinstance(label, str):
+        return ((ord(label), ord(label)),)
+    if isinstance(label, CharSet):
+        return label.intervals
+
+    intervals = []
+    for code_point in sorted(map(ord, label)):
+        if intervals and intervals[-1][1] == code_point - 1:
+            intervals[-1][1] = code_point
+        else:
+            intervals.append([code_point, code_point])
+    return intervals
+
+
+def merge_segments(points, ids):
+    boundaries = []
+    merged = []
+    for point, c in zip(points, ids):
+        if not merged or merged[-1] != c:
+            boundaries.append(point)
+            merged.append(c)
+    return ClassMap(boundaries, merged)
+
+
+def alphabet_classes(labels):
+    """
+    Splits the alphabet in classes of characters that are matched by exactly
+    the same labels, which makes them interchangeable in any automaton using
+    those labels. Returns the `ClassMap` and the class ids each label covers.
+    """
+
+    labels = list(labels)
+    points = sorted(
+        {
+            p
+            for label in labels
+            for lo, hi in label_intervals(label)
+            for p in (lo, hi + 1)
+        }
+    )
+
+    covers = [[] for _ in points]
+    for n, label in enumerate(labels):
+        for lo, hi in label_intervals(label):
+            for i in range(bisect_left(points, lo), bisect_left(points, hi + 1)):
+                covers[i].append(n)
+
+    signatures = {(): 0}
+    ids = []
+    for cover in covers:
+        cover = tuple(cover)
+        if cover not in signatures:
+            signatures[cover] = len(signatures)
+        ids.append(signatures[cover])
+
+    label_classes = {label: set() for label in labels}
+    for cover, c in zip(covers, ids):
+        for n in cover:
+            label_classes[labels[n]].add(c)
+
+    return merge_segments(points, ids), label_classes
+
+
+def combine_classes(class_maps):
+    """
+    Refines several class maps into a common one. Returns it along with, for
+    each of the given maps, the common classes every one of its classes
+    splits into.
+    """
+
+    points = sorted({p for m in class_maps for p in m.boundaries})
+
+    signatures = {tuple(0 for _ in class_maps): 0}
+    ids = []
+    for point in points:
+        signature = tuple(m.class_of(point) for m in class_maps)
+        if signature not in signatures:
+            signatures[signature] = len(signatures)
+        ids.append(signatures[signature])
+
+    splits = [{} for _ in class_maps]
+    for signature, c in signatures.items():
+        if c:
+            for split, local in zip(splits, signature):
+                split.setdefault(local, []).append(c)
+
+    return merge_segments(points, ids), splits
+
+
+class TransitionTable:
+    """
+    Flat, integer-indexed form of a deterministic automaton.
+
+    States are numbered from `0` to `states - 1` and characters are mapped to
+    alphabet classes by `classes`, a `ClassMap`. Class `0` never has a
+    transition. The next state of `(state, class)` lives at
+    `transitions[state * width + class]`, `-1` being the dead state.
+    """
+
+    def __init__(self, states, classes, transitions, accepts, start=0):
+        self.states = states
+        self.start = start
+        self.classes = classes
+        self.width = classes.size
+        self.transitions = transitions
+        self.accepts = accepts
+
+    def next_state(self, state, symbol):
+        return self.transitions[state * self.width + self.classes[symbol]]
+
+    def __reduce__(self):
+        # a table loaded from a file holds views of it, which can't be pickled
+        return TransitionTable, (
+            self.states,
+            self.classes,
+            array("i", self.transitions),
+            array("i", self.accepts),
+            self.start,
+        )
+
+    @staticmethod
+    def from_state(start, classes, accept=lambda state: 0 if state.final else -1):
+        """
+        Builds the table of the deterministic automaton starting at `start`,
+        whose transitions are labeled with the class ids of `classes`. Classes
+        that lead every state to the same destination are merged.
+        """
+
+        states = [start]
+        ids = {id(start): 0}
+        for state in states:
+            for destination, *_ in state.transitions.values():
+                if id(destination) not in ids:
+                    ids[id(destination)] = len(states)
+                    states.append(destination)
+
+        columns = {}
+        for n, state in enumerate(states):
+            for symbol, (destination, *_) in state.transitions.items():
+                try:
+                    column = columns[symbol]
+                except KeyError:
+                    column = columns[symbol] = [-1] * len(states)
+                column[n] = ids[id(destination)]
+
+        accepts = array("i", (accept(state) for state in states))
+        return TransitionTable.from_columns(classes, columns, accepts)
+
+    @staticmethod
+    def from_columns(classes, columns, accepts, start=0):
+        """
+        Builds a table from the destinations of every state by each class id
+        of `classes`. Classes that lead every state to the same destination
+        are merged.
+        """
+
+        states = len(accepts)
+
+        merged = {}
+        class_columns = {}
+        for symbol, column in columns.items():
+            column = tuple(column)
+            try:
+                merged[symbol] = class_columns[column]
+            except KeyError:
+                merged[symbol] = class_columns[column] = len(class_columns) + 1
+
+        width = len(class_columns) + 1
+        transitions = array("i", [-1]) * (states * width)
+        for column, c in class_columns.items():
+            for n, destination in enumerate(column):
+                transitions[n * width + c] = destination
+
+        classes = merge_segments(
+            classes.boundaries, [merged.get(c, 0) for c in classes.ids]
+        )
+        return TransitionTable(states, classes, transitions, accepts, start)
+
+    def minimize(self):
+        """
+        Returns the minimal table recognizing the same language. States are
+        only merged if they accept the same value, so a lexer table keeps
+        telling its tokens apart.
+        """
+
+        width = self.width
+        transitions = []
+        for state in range(self.states):
+            row = self.transitions[state * width : (state + 1) * width]
+            transitions.append({c: d for c, d in enumerate(row) if d >= 0})
+        blocks, states = state_minimization(transitions, self.accepts, -1)
+
+        accepts = array("i", [-1]) * states
+        columns = {c: [-1] * states for c in range(1, width)}
+        for state, moves in enumerate(transitions):
+            block = blocks[state]
+            accepts[block] = self.accepts[state]
+            for c, destination in moves.items():
+                columns[c][block] = blocks[destination]
+
+        return TransitionTable.from_columns(
+            self.classes, columns, accepts, blocks[self.start]
+        )
+
+
 def multiline_formatter(state):
     return "\n".join(str(item) for item in state)
 
@@ -278,15 +593,18 @@ class NFA:
 
 class DFA(NFA):
 
-    def __init__(self, states, finals, transitions, start=0):
+    def __init__(self, states, finals, transitions, start=0, classes=None):
         assert all(isinstance(value, int) for value in transitions.values())
-        assert all(len(symbol) > 0 for origin, symbol in transitions)
+        assert all(symbol != "" for origin, symbol in transitions)
 
         transitions = {key: [value] for key, value in transitions.items()}
         NFA.__init__(self, states, finals, transitions, start)
         self.current = start
+        self.classes = classes
 
     def _move(self, symbol):
+        if self.classes is not None:
+            symbol = self.classes[symbol]
         try:
             self.current = self.transitions[self.current][symbol][0]
         except KeyError:
@@ -328,41 +646,288 @@ def epsilon_closure(automaton, states):
 
 
 def nfa_to_dfa(automaton):
+    """
+    Subset construction over alphabet classes instead of symbols: characters
+    matched by the same labels behave the same in every state, so each class
+    is followed once per DFA state. The resulting DFA maps characters to its
+    transition labels through `classes`.
+    """
+
+    classes, label_classes = alphabet_classes(automaton.vocabulary)
+    class_automaton = NFA(automaton.states, automaton.finals, {}, automaton.start)
+    for (origin, label), destinations in automaton.map.items():
+        moves = class_automaton.transitions[origin]
+        if label == "":
+            moves[""] = destinations
+            continue
+        for c in label_classes[label]:
+            moves.setdefault(c, set()).update(destinations)
+
     transitions = {}
 
-    start = epsilon_closure(automaton, [automaton.start])
-    start.id = 0
-    start.is_final = any(s in automaton.finals for s in start)
-    states = [start]
+    # closures are looked up by their states, and the closure of a set of
+    # states is made of the closures of each one, which are computed once
+    closures = {}
+
+    def closure(states):
+        result = set()
+        for state in states:
+            try:
+                result |= closures[state]
+            except KeyError:
+                closures[state] = frozenset(epsilon_closure(class_automaton, [state]))
+                result |= closures[state]
+        return frozenset(result)
+
+    start = closure([automaton.start])
+    ids = {start: 0}
 
     pending = [start]
     while pending:
         state = pending.pop()
+        origin = ids[state]
 
-        for symbol in automaton.vocabulary:
-            destinations = move(automaton, state, symbol)
-            destinations = epsilon_closure(automaton, destinations)
-            if len(destinations) == 0:
+        for symbol in range(1, classes.size):
+            destinations = closure(move(class_automaton, state, symbol))
+            if not destinations:
                 continue
-            if destinations not in states:
-                destinations.is_final = any(s in automaton.finals for s in destinations)
-                destinations.id = len(states)
-                states.append(destinations)
+            try:
+                destination = ids[destinations]
+            except KeyError:
+                destination = ids[destinations] = len(ids)
                 pending.append(destinations)
-            else:
-                destinations = states[states.index(destinations)]
+            transitions[origin, symbol] = destination
+
+    finals = [id for state, id in ids.items() if not automaton.finals.isdisjoint(state)]
+    dfa = DFA(len(ids), finals, transitions, classes=classes)
+    return dfa
+
+
+class NFABuilder:
+    """
+    Thompson construction over a single automaton that grows in place.
+
+    Every operation adds its states and edges to the shared automaton and
+    returns a fragment, the pair of its start and final states, so building
+    an automaton costs time linear in the size of its regex. The operands of
+    an operation become part of its result and must not be used again.
+    """
+
+    def __init__(self):
+        self.transitions = []
+
+    def state(self):
+        self.transitions.append({})
+        return len(self.transitions) - 1
+
+    def edge(self, origin, label, destination):
+        self.transitions[origin].setdefault(label, []).append(destination)
+
+    def epsilon(self):
+        state = self.state()
+        return state, state
+
+    def symbol(self, label):
+        start, final = self.state(), self.state()
+        self.edge(start, label, final)
+        return start, final
+
+    def union(self, *fragments):
+        start, final = self.state(), self.state()
+        for fragment_start, fragment_final in fragments:
+            self.edge(start, "", fragment_start)
+            self.edge(fragment_final, "", final)
+        return start, final
+
+    def concatenation(self, a1, a2):
+        self.edge(a1[1], "", a2[0])
+        return a1[0], a2[1]
+
+    def closure(self, a1):
+        start, final = self.state(), self.state()
+        self.edge(start, "", a1[0])
+        self.edge(start, "", final)
+        self.edge(a1[1], "", final)
+        self.edge(final, "", start)
+        return start, final
+
+    def build(self, fragment):
+        start, final = fragment
+        transitions = {
+            (origin, label): destinations
+            for origin, moves in enumerate(self.transitions)
+            for label, destinations in moves.items()
+        }
+        return NFA(len(self.transitions), [final], transitions, start)
+
+
+def positions_to_dfa(labels, followpos, start):
+    """
+    Builds a DFA straight from the positions of a regex (Aho, Sethi and
+    Ullman): `labels` holds the label of every position, `followpos` the
+    positions that can follow each one and `start` the positions that can
+    come first. The last position must be the end marker of the regex, and
+    the states holding it are final. Like `nfa_to_dfa`, it works over
+    alphabet classes.
+    """
+
+    end = len(labels) - 1
+    classes, label_classes = alphabet_classes(set(labels[:end]))
+    position_classes = [label_classes[label] for label in labels[:end]]
+
+    transitions = {}
+    start = frozenset(start)
+    ids = {start: 0}
+
+    pending = [start]
+    while pending:
+        state = pending.pop()
+        origin = ids[state]
+
+        moves = {}
+        for position in state:
+            if position != end:
+                for c in position_classes[position]:
+                    moves.setdefault(c, set()).update(followpos[position])
 
+        for symbol in sorted(moves):
+            destinations = frozenset(moves[symbol])
             try:
-                transitions[state.id, symbol]
-                assert False, "Invalid DFA!!!"
+                destination = ids[destinations]
             except KeyError:
-                transitions[state.id, symbol] = destinations.id
-            except AssertionError:
-                pass
+                destination = ids[destinations] = len(ids)
+                pending.append(destinations)
+            transitions[origin, symbol] = destination
+
+    finals = [id for state, id in ids.items() if end in state]
+    return DFA(len(ids), finals, transitions, classes=classes)
 
-    finals = [state.id for state in states if state.is_final]
-    dfa = DFA(len(states), finals, transitions)
-    return dfa
+
+class LazyState:
+    __slots__ = ("key", "transitions", "final")
+
+    def __init__(self, key, final):
+        self.key = key
+        self.transitions = {}
+        self.final = final
+
+
+class LazyDFA:
+    """
+    DFA of an NFA whose states are built the first time a scan reaches them,
+    so patterns whose full DFA is exponential cost nothing up front.
+
+    At most `max_states` DFA states are kept, the least recently used ones
+    being dropped first. A scan that keeps building states because of that
+    goes on simulating the NFA instead, without caching anything else.
+    """
+
+    def __init__(self, automaton, max_states=1024):
+        self.classes, label_classes = alphabet_classes(automaton.vocabulary)
+        self.moves = [{} for _ in range(automaton.states)]
+        self.epsilons = [() for _ in range(automaton.states)]
+        for (origin, label), destinations in automaton.map.items():
+            if label == "":
+                self.epsilons[origin] = destinations
+                continue
+            for c in label_classes[label]:
+                self.moves[origin].setdefault(c, set()).update(destinations)
+
+        self.finals = frozenset(automaton.finals)
+        self.max_states = max_states
+        self.cache = OrderedDict()
+        self.closures = {}
+        self.evictions = 0
+        self.start = self.closure([automaton.start])
+
+    def closure(self, states):
+        result = set()
+        for state in states:
+            try:
+                result |= self.closures[state]
+            except KeyError:
+                closure = {state}
+                pending = [state]
+                while pending:
+                    for destination in self.epsilons[pending.pop()]:
+                        if destination not in closure:
+                            closure.add(destination)
+                            pending.append(destination)
+                self.closures[state] = frozenset(closure)
+                result |= closure
+        return frozenset(result)
+
+    def move(self, key, c):
+        destinations = set()
+        for state in key:
+            destinations.update(self.moves[state].get(c, ()))
+        return self.closure(destinations)
+
+    def state(self, key):
+        cache = self.cache
+        try:
+            state = cache[key]
+            cache.move_to_end(key)
+        except KeyError:
+            state = cache[key] = LazyState(key, not self.finals.isdisjoint(key))
+            if len(cache) > self.max_states:
+                cache.popitem(last=False)
+                self.evictions += 1
+        return state
+
+    def longest(self, text, start=0, end=None):
+        """
+        Returns the end of the longest match in `text` starting at `start`,
+        or `-1` if there is none.
+        """
+
+        end = len(text) if end is None else end
+        classes = self.classes
+        evictions = self.evictions
+
+        state = self.state(self.start)
+        last = start if state.final else -1
+
+        for index in range(start, end):
+            c = classes[text[index]]
+            try:
+                key = state.transitions[c]
+            except KeyError:
+                key = state.transitions[c] = self.move(state.key, c)
+            if not key:
+                return last
+
+            if self.evictions - evictions > self.max_states:
+                # the cache is thrashing: simulate the NFA from here on
+                return self.simulate(text, index + 1, end, key, last)
+
+            state = self.state(key)
+            if state.final:
+                last = index + 1
+
+        return last
+
+    def simulate(self, text, start, end, key, last):
+        classes = self.classes
+        finals = self.finals
+
+        if not finals.isdisjoint(key):
+            last = start
+        for index in range(start, end):
+            key = self.move(key, classes[text[index]])
+            if not key:
+                break
+            if not finals.isdisjoint(key):
+                last = index + 1
+        return last
+
+    @cached_property
+    def first(self):
+        """
+        Classes of the characters a match can start with.
+        """
+
+        return {c for state in self.start for c in self.moves[state]}
 
 
 def automata_union(a1: NFA, a2: NFA):
@@ -466,83 +1031,85 @@ def automata_closure(a1):
     return NFA(states, finals, transitions, start)
 
 
-def distinguish_states(group, automaton, partition):
-    split = {}
-    vocabulary = tuple(automaton.vocabulary)
-
-    marks = [False] * len(group)
-
-    for i, member in enumerate(group):
-        if marks[i]:
-            continue
-        split[member.value] = [member.value]
-        marks[i] = True
-        for j, other in enumerate(group):
-            if member != other:
-                t1 = automaton.transitions[member.value]
-                t2 = automaton.transitions[other.value]
-                all_equal = True
-                for symbol in vocabulary:
-                    # Compare transitions ...
-                    if partition[t1[symbol][0]] != partition[t2[symbol][0]]:
-                        all_equal = False
-                        break
-                if all_equal:
-                    split[member.value].append(other.value)
-                    marks[j] = True
-
-    if len(split) == 0:
-        return [element.value for element in group]
-
-    return [group for group in split.values()]
-
-
-def state_minimization(automaton):
-    partition = DisjointSet(*range(automaton.states))
-
-    partition.merge(automaton.finals)
-    partition.merge(
-        [state for state in range(automaton.states) if state not in automaton.finals]
-    )
-
-    while True:
-        new_partition = DisjointSet(*range(automaton.states))
-
-        for group in partition.groups:
-            new_groups = distinguish_states(group, automaton, partition)
-            for new_group in new_groups:
-                new_partition.merge(new_group)
-
-        if len(new_partition) == len(partition):
-            break
-
-        partition = new_partition
+def state_minimization(transitions, labels, rejecting):
+    """
+    Partitions the states of a deterministic automaton in classes of
+    equivalent states with Hopcroft's algorithm, in O(n log n) for a fixed
+    alphabet. `transitions` holds a dict from symbols to destinations for
+    every state and `labels` what every state accepts: states with different
+    labels are never merged. Missing transitions go to a dead state labeled
+    `rejecting`. Returns the class of every state, classes being numbered in
+    the order of their first state, and the number of classes.
+    """
+
+    states = len(transitions)
+    dead = states
+    symbols = {symbol for moves in transitions for symbol in moves}
+
+    inverse = {symbol: [[] for _ in range(states + 1)] for symbol in symbols}
+    for origin, moves in enumerate(transitions):
+        for symbol, origins in inverse.items():
+            origins[moves.get(symbol, dead)].append(origin)
+    for origins in inverse.values():
+        origins[dead].append(dead)
+
+    groups = {}
+    for state, label in enumerate([*labels, rejecting]):
+        groups.setdefault(label, set()).add(state)
+    blocks = list(groups.values())
+    block_of = [0] * (states + 1)
+    for b, block in enumerate(blocks):
+        for state in block:
+            block_of[state] = b
+
+    pending = set(range(len(blocks)))
+    while pending:
+        splitter = tuple(blocks[pending.pop()])
+        for origins in inverse.values():
+            touched = {}
+            for state in splitter:
+                for origin in origins[state]:
+                    touched.setdefault(block_of[origin], set()).add(origin)
+
+            for b, inside in touched.items():
+                block = blocks[b]
+                if len(inside) == len(block):
+                    continue
+
+                block -= inside
+                split = len(blocks)
+                blocks.append(inside)
+                for state in inside:
+                    block_of[state] = split
+
+                # either half is enough to split by, unless `b` is pending
+                if b in pending or len(inside) <= len(block):
+                    pending.add(split)
+                else:
+                    pending.add(b)
 
-    return partition
+    numbers = {}
+    classes = [numbers.setdefault(block_of[s], len(numbers)) for s in range(states)]
+    return classes, len(numbers)
 
 
 def automata_minimization(automaton):
-    partition = state_minimization(automaton)
-
-    states = [s for s in partition.representatives]
-
-    transitions = {}
-    for i, state in enumerate(states):
-        origin = partition[state.value].representative
-        for symbol, destinations in automaton.transitions[origin.value].items():
-            t = partition[destinations[0]].representative
-            transitions[i, symbol] = states.index(t)
-
-            try:
-                transitions[i, symbol]
-            except KeyError:
-                pass
-
-    finals = [
-        states.index(partition[final].representative)
-        for final in automaton.finals
-        if partition[final].representative in states
+    transitions = [
+        {symbol: destinations[0] for symbol, destinations in moves.items()}
+        for moves in (automaton.transitions[s] for s in range(automaton.states))
     ]
-    start = partition[automaton.start].representative.value
-
-    return DFA(len(states), finals, transitions, start)
+    finals = [s in automaton.finals for s in range(automaton.states)]
+    classes, states = state_minimization(transitions, finals, False)
+
+    minimized = {}
+    for state, moves in enumerate(transitions):
+        for symbol, destination in moves.items():
+            minimized[classes[state], symbol] = classes[destination]
+
+    return DFA(
+        states,
+        {classes[s] for s in automaton.finals},
+        minimized,
+        classes[automaton.start],
+        automaton.classes,
+    )
@@ -0,0 +1,271 @@
+"""
+Compact binary format for compiled automata.
+
+A file is a header, a section directory and the sections, all little-endian:
+
+    offset  size  field
+    0       4     magic, b"BRUA"
+    4       4     format version (`VERSION`)
+    8       4     kind: 1 for a transition table, 2 for an NFA
+    12      4     number of sections, `n`
+    16      4     CRC-32 of everything after the header
+    20      32    key the automaton was built from (raw sha256 digest, or
+                  zeros)
+    52      16n   for every section, its offset from the start of the file
+                  and its length in bytes, as two unsigned 64 bit integers
+
+Sections start at multiples of 8 bytes and, except for the metadata, are
+arrays of signed 32 bit integers.
+
+A transition table (`TransitionTable`, also used for `DFA`s) has the
+sections:
+
+    0  params       states, width (classes, `0` included) and start state
+    1  boundaries   first code point of every class interval, ascending
+    2  class ids    class of every interval
+    3  transitions  `states * width` destinations, `-1` being the dead state
+    4  accepts      value accepted by every state, `-1` if none
+    5  metadata     UTF-8 JSON, free for the writer to use
+
+An NFA has the sections:
+
+    0  params       states and start state
+    1  finals       final states
+    2  offsets      `states + 1` indexes into `edges`: the edges of state `s`
+                    are the pairs from `offsets[s]` to `offsets[s + 1]`
+    3  edges        (label, destination) pairs, label `-1` being epsilon
+    4  labels       `labels + 1` indexes into `intervals`
+    5  intervals    (first, last) code point pairs, inclusive
+
+Loading a table does not deserialize it: its transitions and accepts are
+views of the buffer it is loaded from, so a table can be used straight from
+an `mmap` of its file.
+"""
+
+import json
+import struct
+import sys
+import zlib
+from array import array
+
+from .automata import NFA, CharSet, ClassMap, TransitionTable, label_intervals
+
+
+MAGIC = b"BRUA"
+VERSION = 2
+
+TABLE = 1
+NFA_KIND = 2
+
+HEADER = struct.Struct("<4sIIII32s")
+SECTION = struct.Struct("<QQ")
+
+
+class FormatError(Exception):
+    pass
+
+
+def pack(kind, sections, key=""):
+    key = bytes.fromhex(key) if key else bytes(32)
+
+    data = []
+    for section in sections:
+        if not isinstance(section, bytes):
+            section = array("i", section)
+            if sys.byteorder != "little":
+                section.byteswap()
+            section = section.tobytes()
+        data.append(section)
+
+    directory = []
+    chunks = []
+    offset = HEADER.size + SECTION.size * len(data)
+    for section in data:
+        chunks.append(bytes(-offset % 8))
+        offset += -offset % 8
+        directory.append(SECTION.pack(offset, len(section)))
+        chunks.append(section)
+        offset += len(section)
+
+    body = b"".join([*directory, *chunks])
+    header = HEADER.pack(MAGIC, VERSION, kind, len(data), zlib.crc32(body), key)
+    return header + body
+
+
+def unpack(buffer, kind):
+    """
+    Returns the key and the sections of an automaton of the given kind
+    stored in `buffer`, integer sections being views of the buffer.
+    """
+
+    buffer = memoryview(buffer)
+    if len(buffer) < HEADER.size:
+        raise FormatError("Truncated automaton")
+
+    magic, version, stored_kind, count, checksum, key = HEADER.unpack_from(buffer)
+    if magic != MAGIC or version != VERSION or stored_kind != kind:
+        raise FormatError("Not an automaton of the expected kind or version")
+    if zlib.crc32(buffer[HEADER.size :]) != checksum:
+        raise FormatError("Damaged automaton")
+
+    if HEADER.size + SECTION.size * count > len(buffer):
+        raise FormatError("Truncated automaton")
+
+    sections = []
+    for n in range(count):
+        offset, length = SECTION.unpack_from(buffer, HEADER.size + SECTION.size * n)
+        if offset + length > len(buffer):
+            raise FormatError("Truncated automaton")
+        sections.append(buffer[offset : offset + length])
+
+    return key.hex() if any(key) else "", sections
+
+
+def ints(section):
+    if len(section) % 4:
+        raise FormatError("Misaligned integer section")
+
+    if sys.byteorder == "little":
+        return section.cast("i")
+
+    values = array("i", section)
+    values.byteswap()
+    return values
+
+
+def dump_table(table: TransitionTable, metadata=None, key=""):
+    sections = [
+        [table.states, table.width, table.start],
+        table.classes.boundaries,
+        table.classes.ids,
+        table.transitions,
+        table.accepts,
+        json.dumps(metadata).encode("utf8"),
+    ]
+    return pack(TABLE, sections, key)
+
+
+def load_table(buffer):
+    """
+    Returns the table stored in `buffer`, its metadata and its key. The
+    sections are checked to fit together, so a damaged table is rejected
+    with a `FormatError` instead of failing when it is used.
+    """
+
+    key, sections = unpack(buffer, TABLE)
+    if len(sections) != 6:
+        raise FormatError("Not a transition table")
+    params, boundaries, ids, transitions, accepts = map(ints, sections[:5])
+    if len(params) != 3:
+        raise FormatError("Bad table parameters")
+    states, width, start = params
+
+    if (
+        len(transitions) != states * width
+        or len(accepts) != states
+        or len(boundaries) != len(ids)
+    ):
+        raise FormatError("Inconsistent section lengths")
+    # every state and class the table can reach must be within its arrays
+    if (
+        not 0 <= start < states
+        or not -1
+        <= min(transitions, default=-1)
+        <= max(transitions, default=-1)
+        < states
+        or min(ids, default=0) < 0
+    ):
+        raise FormatError("Inconsistent table")
+
+    classes = ClassMap(boundaries, ids)
+    table = TransitionTable(states, classes, transitions, accepts, start)
+    if table.width != width:
+        raise FormatError("Inconsistent table width")
+
+    try:
+        metadata = json.loads(bytes(sections[5]))
+    except ValueError as e:
+        raise FormatError("Bad table metadata") from e
+    return table, metadata, key
+
+
+def dump_dfa(automaton, key=""):
+    """
+    Stores a `DFA` over alphabet classes as a transition table whose states
+    accept `0` if they are final.
+    """
+
+    width = automaton.classes.size
+    transitions = array("i", [-1]) * (automaton.states * width)
+    for (origin, c), (destination,) in automaton.map.items():
+        transitions[origin * width + c] = destination
+    accepts = array(
+        "i", (0 if s in automaton.finals else -1 for s in range(automaton.states))
+    )
+
+    table = TransitionTable(
+        automaton.states, automaton.classes, transitions, accepts, automaton.start
+    )
+    return dump_table(table, key=key)
+
+
+def dump_nfa(automaton: NFA, key=""):
+    labels = {}
+    offsets = [0]
+    edges = []
+    for state in range(automaton.states):
+        for label, destinations in automaton.transitions[state].items():
+            n = -1 if label == "" else labels.setdefault(label, len(labels))
+            for destination in destinations:
+                edges += (n, destination)
+        offsets.append(len(edges) // 2)
+
+    label_offsets = [0]
+    intervals = []
+    for label in labels:
+        for lo, hi in label_intervals(label):
+            intervals += (lo, hi)
+        label_offsets.append(len(intervals) // 2)
+
+    sections = [
+        [automaton.states, automaton.start],
+        sorted(automaton.finals),
+        offsets,
+        edges,
+        label_offsets,
+        intervals,
+    ]
+    return pack(NFA_KIND, sections, key)
+
+
+def load_nfa(buffer):
+    """
+    Returns the NFA stored in `buffer` and its key. Single characters are
+    labeled with strings and any other label with a `CharSet`.
+    """
+
+    key, sections = unpack(buffer, NFA_KIND)
+    if len(sections) != 6:
+        raise FormatError("Not an NFA")
+    params, finals, offsets, edges, label_offsets, intervals = map(ints, sections)
+    if len(params) != 2:
+        raise FormatError("Bad NFA parameters")
+    states, start = params
+
+    labels = []
+    for n in range(len(label_offsets) - 1):
+        pairs = intervals[2 * label_offsets[n] : 2 * label_offsets[n + 1]]
+        pairs = list(zip(pairs[::2], pairs[1::2]))
+        if len(pairs) == 1 and pairs[0][0] == pairs[0][1]:
+            labels.append(chr(pairs[0][0]))
+        else:
+            labels.append(CharSet(pairs))
+
+    transitions = {}
+    for state in range(states):
+        for edge in range(offsets[state], offsets[state + 1]):
+            label, destination = edges[2 * edge], edges[2 * edge + 1]
+            label = "" if label < 0 else labels[label]
+            transitions.setdefault((state, label), []).append(destination)
+
+    return NFA(states, finals, transitions, start), key
@@ -0,0 +1,168 @@
+"""
+Normalization of regex ASTs before their automata are built.
+
+The parser produces binary trees that mirror the syntax: `x?` is a union
+with an epsilon, `(x*)*` keeps both closures and an alternation of words is
+a chain of unions of concatenations. `simplify` rewrites a tree into an
+equivalent one that yields a smaller NFA:
+
+- unions and concatenations are flattened and rebuilt as balanced trees,
+- epsilons are dropped from concatenations and from unions that are
+  nullable anyway,
+- single-character alternatives are merged into one character set,
+- repeated alternatives are removed,
+- closures of closures and closures of optional expressions collapse,
+- alternatives sharing a prefix are factored, like `sin|sqrt` into
+  `s(in|qrt)`.
+"""
+
+from .automata import CharSet
+from .ast import (
+    CharSetNode,
+    ClosureNode,
+    ConcatNode,
+    EpsilonNode,
+    Node,
+    SymbolNode,
+    UnionNode,
+    operands,
+)
+
+
+def simplify(node: Node) -> Node:
+    if isinstance(node, UnionNode):
+        alternatives = [simplify(n) for n in operands(node, UnionNode)]
+        return factor([sequence(n) for n in alternatives])
+
+    if isinstance(node, ConcatNode):
+        return concatenation([simplify(n) for n in operands(node, ConcatNode)])
+
+    if isinstance(node, ClosureNode):
+        return closure(simplify(node.node))
+
+    return node
+
+
+def sequence(node):
+    return operands(node, ConcatNode)
+
+
+def key(node):
+    """
+    Hashable form of a simplified tree, equal for equal trees.
+    """
+
+    if isinstance(node, SymbolNode):
+        return "s", node.lex
+    if isinstance(node, CharSetNode):
+        return "c", node.chars
+    if isinstance(node, EpsilonNode):
+        return ("e",)
+    if isinstance(node, ClosureNode):
+        return "*", key(node.node)
+    if isinstance(node, UnionNode):
+        return "|", frozenset(key(n) for n in operands(node, UnionNode))
+    return ".", tuple(key(n) for n in operands(node, ConcatNode))
+
+
+def nullable(node):
+    if isinstance(node, (EpsilonNode, ClosureNode)):
+        return True
+    if isinstance(node, UnionNode):
+        return nullable(node.left) or nullable(node.right)
+    if isinstance(node, ConcatNode):
+        return nullable(node.left) and nullable(node.right)
+    return False
+
+
+def balanced(nodes, kind):
+    if len(nodes) == 1:
+        return nodes[0]
+    middle = len(nodes) // 2
+    return kind(balanced(nodes[:middle], kind), balanced(nodes[middle:], kind))
+
+
+def concatenation(nodes):
+    nodes = [
+        n
+        for node in nodes
+        for n in operands(node, ConcatNode)
+        if not isinstance(n, EpsilonNode)
+    ]
+    return balanced(nodes, ConcatNode) if nodes else EpsilonNode()
+
+
+def union(nodes):
+    chars = []
+    alternatives = {}
+    for node in nodes:
+        for n in operands(node, UnionNode):
+            if isinstance(n, SymbolNode):
+                chars.append(CharSet.range(n.lex, n.lex))
+            elif isinstance(n, CharSetNode):
+                chars.append(n.chars)
+            else:
+                alternatives.setdefault(key(n), n)
+
+    alternatives = list(alternatives.values())
+    if chars:
+        merged = CharSet([interval for c in chars for interval in c.intervals])
+        if (
+            len(merged.intervals) == 1
+            and merged.intervals[0][0] == merged.intervals[0][1]
+        ):
+            alternatives.insert(0, SymbolNode(chr(merged.intervals[0][0])))
+        else:
+            alternatives.insert(0, CharSetNode(merged))
+
+    epsilon = ("e",)
+    if len(alternatives) > 1 and any(
+        nullable(n) for n in alternatives if key(n) != epsilon
+    ):
+        alternatives = [n for n in alternatives if key(n) != epsilon]
+
+    return balanced(alternatives, UnionNode)
+
+
+def factor(sequences):
+    """
+    Builds the union of the concatenations in `sequences`, sharing the
+    common prefixes of the alternatives.
+    """
+
+    empty = False
+    groups = {}
+    for nodes in sequences:
+        if nodes:
+            groups.setdefault(key(nodes[0]), []).append(nodes)
+        else:
+            empty = True
+
+    alternatives = []
+    for group in groups.values():
+        if len(group) == 1:
+            alternatives.append(concatenation(group[0]))
+        else:
+            rest = factor([nodes[1:] for nodes in group])
+            alternatives.append(concatenation([group[0][0], rest]))
+    if empty:
+        alternatives.append(EpsilonNode())
+
+    return union(alternatives)
+
+
+def closure(node):
+    # (x*)* = x*, (x|ε)* = x* and (x*|y)* = (x|y)*
+    if isinstance(node, ClosureNode):
+        return node
+
+    alternatives = []
+    for n in operands(node, UnionNode):
+        if isinstance(n, ClosureNode):
+            n = n.node
+        if not isinstance(n, EpsilonNode):
+            alternatives.append(n)
+
+    if not alternatives:
+        return EpsilonNode()
+    return ClosureNode(union(alternatives))
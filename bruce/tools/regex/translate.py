@@ -0,0 +1,110 @@
+"""
+Translation of regex ASTs to patterns of Python's `re` module.
+
+The two engines don't agree on what a match is: `re` takes the first
+alternative that matches, not the longest one, and happily matches the empty
+string. A translated pattern recognizes the same language as its regex, but
+which of its matches `re` returns is up to the caller to check, and
+`longest_first` tells the regexes for which it is always the longest.
+"""
+
+from .automata import CharSet, label_intervals
+from .ast import (
+    CharSetNode,
+    ClosureNode,
+    ConcatNode,
+    EpsilonNode,
+    Node,
+    SymbolNode,
+    UnionNode,
+    operands,
+)
+from .simplify import nullable
+
+
+def translate(node: Node, nonempty=False) -> str:
+    """
+    Returns an `re` pattern for the regex of `node`. With `nonempty=True` the
+    pattern doesn't match the empty string, even if the regex does.
+    """
+
+    if isinstance(node, EpsilonNode):
+        return "(?!)" if nonempty else ""
+
+    if isinstance(node, SymbolNode):
+        return escape(ord(node.lex))
+
+    if isinstance(node, CharSetNode):
+        return char_class(node.chars)
+
+    if isinstance(node, UnionNode):
+        alternatives = (translate(n, nonempty) for n in operands(node, UnionNode))
+        return f"(?:{'|'.join(alternatives)})"
+
+    if isinstance(node, ClosureNode):
+        body = f"(?:{translate(node.node)})*"
+        return f"(?:{translate(node.node, True)}){body}" if nonempty else body
+
+    return concatenation(operands(node, ConcatNode), nonempty)
+
+
+def longest_first(node: Node) -> bool:
+    """
+    Whether the match `re` finds for the translation of `node` is always the
+    longest one. It is when the regex is deterministic, the next character
+    telling which of its positions comes next, and no union has a nullable
+    alternative before another: `re` then only chooses between going on and
+    stopping, and it tries going on first.
+    """
+
+    labels, followpos = [], []
+    _, first, _ = node.positions(labels, followpos)
+    for positions in [first, *followpos]:
+        intervals = sorted(i for p in positions for i in label_intervals(labels[p]))
+        if any(lo <= hi for (_, hi), (lo, _) in zip(intervals, intervals[1:])):
+            return False
+    return ordered(node)
+
+
+def ordered(node):
+    pending = [node]
+    while pending:
+        node = pending.pop()
+        if isinstance(node, UnionNode):
+            alternatives = operands(node, UnionNode)
+            if any(nullable(n) for n in alternatives[:-1]):
+                return False
+            pending += alternatives
+        elif isinstance(node, ClosureNode):
+            pending.append(node.node)
+        elif isinstance(node, ConcatNode):
+            pending += operands(node, ConcatNode)
+    return True
+
+
+def concatenation(nodes, nonempty):
+    if not nonempty:
+        return "".join(translate(n) for n in nodes)
+
+    # a nonempty match of `xy` is a nonempty `x` followed by `y`, or an
+    # empty `x` followed by a nonempty `y`
+    head, rest = nodes[0], nodes[1:]
+    first = translate(head, True) + "".join(translate(n) for n in rest)
+    if not rest or not nullable(head):
+        return first
+    return f"(?:{first}|{concatenation(rest, True)})"
+
+
+def char_class(chars: CharSet):
+    ranges = []
+    for lo, hi in label_intervals(chars):
+        ranges.append(escape(lo) if lo == hi else f"{escape(lo)}-{escape(hi)}")
+    return f"[{''.join(ranges)}]"
+
+
+def escape(code_point: int):
+    if code_point < 0x100:
+        return f"\\x{code_point:02x}"
+    if code_point < 0x10000:
+        return f"\\u{code_point:04x}"
+    return f"\\U{code_point:08x}"
@@ -1,13 +1,230 @@
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+
 from .grammar import Terminal
 
 
+# Token type of the runs of characters that no token matches.
+ERROR = Terminal("error", None)
+
+NEWLINE = re.compile(r"\r\n?|\n")
+TAB = re.compile(r"\t")
+
+# Lines per block of a `LineIndex`. Editing costs about a block of lines and
+# tokens, and a constant time per block after the edit.
+BLOCK_LINES = 32
+
+
+class Block:
+    """
+    A run of whole lines of a source that starts at offset `base`: the
+    offsets where its lines start and where its tabs are, relative to `base`,
+    and `line`, the number of its first line. The tokens that start in it
+    store their offsets relative to `base` too, so moving a block moves all
+    of them.
+    """
+
+    def __init__(self, base: int, line: int, starts=(0,), tabs=()):
+        self.base = base
+        self.line = line
+        self.starts = array("q", starts)
+        self.tabs = array("q", tabs)
+
+
+class LineIndex:
+    """
+    Offsets where the lines and the tabs of a source are, from which the
+    `(line, column)` position of any offset is found by bisection. Lines end
+    at `\\n`, `\\r\\n` or `\\r`, and a tab takes 4 columns.
+
+    The index is made of `blocks` of `BLOCK_LINES` lines, so an edit only
+    rebuilds the blocks around it and moves the ones after it.
+
+    A source may be indexed a piece at a time with `add`, as it is read.
+    """
+
+    def __init__(self, text: str = ""):
+        self.blocks = [Block(0, 1)]
+        self.size = 0
+        self.carriage_return = False
+        self.add(text)
+
+    def add(self, chunk: str):
+        """
+        Indexes `chunk`, the piece of the source that follows the indexed one.
+        """
+
+        if not chunk:
+            return
+
+        base = self.size
+        index = 0
+        # a `\r\n` may be split between two chunks
+        if self.carriage_return and chunk[0] == "\n":
+            last = self.blocks[-1]
+            if len(last.starts) == 1:
+                last.base += 1
+            else:
+                last.starts[-1] += 1
+            index = 1
+
+        self._extend(
+            [base + m.end() for m in NEWLINE.finditer(chunk, index)],
+            [base + m.start() for m in TAB.finditer(chunk)],
+        )
+        self.size += len(chunk)
+        self.carriage_return = chunk[-1] == "\r"
+
+    def _extend(self, starts: list[int], tabs: list[int]):
+        """
+        Appends the line starts and the tabs after the indexed ones, opening a
+        block every `BLOCK_LINES` lines.
+        """
+
+        blocks = self.blocks
+        block = blocks[-1]
+        done = 0
+        for start in starts:
+            if len(block.starts) < BLOCK_LINES:
+                block.starts.append(start - block.base)
+                continue
+            n = bisect_left(tabs, start, done)
+            block.tabs.extend(p - block.base for p in tabs[done:n])
+            done = n
+            block = Block(start, block.line + len(block.starts))
+            blocks.append(block)
+        block.tabs.extend(p - block.base for p in tabs[done:])
+
+    def feed(self, chunks):
+        """
+        Yields `chunks`, indexing each one before it is yielded.
+        """
+
+        for chunk in chunks:
+            self.add(chunk)
+            yield chunk
+
+    def find(self, offset: int) -> int:
+        """
+        Returns the index of the block that holds `offset`.
+        """
+
+        return bisect_right(self.blocks, offset, key=lambda b: b.base) - 1
+
+    def edit(self, start: int, old_end: int, new_end: int, text: str):
+        """
+        Updates the index after an edit that replaced the range `[start,
+        old_end)` of the source with the range `[start, new_end)` of `text`,
+        the edited source.
+
+        The blocks around the edit are rebuilt from `text`, the first of them
+        keeping its place, and the blocks after them are moved. Returns the
+        replaced blocks and the blocks that replaced them.
+        """
+
+        delta = new_end - old_end
+        blocks = self.blocks
+
+        # whether an offset starts a line depends on the character before it
+        # and, after a `\r`, on its own
+        i = self.find(max(start - 1, 0))
+        j = self.find(old_end + 1)
+        first = blocks[i]
+        end = blocks[j + 1].base + delta if j + 1 < len(blocks) else len(text)
+
+        starts = [first.base]
+        starts += (m.end() for m in NEWLINE.finditer(text, first.base, end))
+        if j + 1 < len(blocks) and starts[-1] == end:
+            starts.pop()
+        tabs = [m.start() for m in TAB.finditer(text, first.base, end)]
+
+        # the lines before the edit stay in the first block, since the
+        # tokens on them are kept
+        runs = [[]]
+        for p in starts:
+            if len(runs[-1]) >= BLOCK_LINES and p > start:
+                runs.append([])
+            runs[-1].append(p)
+        if len(runs) > 1 and len(runs[-1]) < BLOCK_LINES // 2:
+            last = runs.pop()
+            runs[-1] += last
+
+        old = blocks[i : j + 1]
+        lines = len(starts) - sum(len(b.starts) for b in old)
+        new = []
+        line = first.line
+        for k, run in enumerate(runs):
+            base = run[0]
+            block = Block(base, line) if new else first
+            block.starts = array("q", [p - base for p in run])
+            a = bisect_left(tabs, base)
+            b = bisect_left(tabs, runs[k + 1][0]) if k + 1 < len(runs) else None
+            block.tabs = array("q", [p - base for p in tabs[a:b]])
+            new.append(block)
+            line += len(run)
+        blocks[i : j + 1] = new
+
+        for block in blocks[i + len(new) :]:
+            block.base += delta
+            block.line += lines
+
+        self.size = len(text)
+        self.carriage_return = text[-1:] == "\r"
+        return old, new
+
+    def position(self, offset: int) -> tuple[int, int]:
+        block = self.blocks[self.find(offset)]
+        offset -= block.base
+        line = bisect_right(block.starts, offset)
+        start = block.starts[line - 1]
+        tabs = bisect_left(block.tabs, offset) - bisect_left(block.tabs, start)
+        return block.line + line - 1, offset - start + 1 + 3 * tabs
+
+
 class Token:
     def __init__(
-        self, lex: str, token_type: Terminal, line: str = None, column: str = None
+        self,
+        lex: str,
+        token_type: Terminal,
+        offset: int = None,
+        reach: int = None,
+        lines: LineIndex = None,
+        block: Block = None,
     ):
+        """
+        With a `block`, `offset` and `reach` are relative to its base.
+        """
+
         self.lex = lex
         self.token_type = token_type
-        self.position = (line, column)
+        self.block = block
+        self._offset = offset
+        self._reach = reach
+        self.lines = lines
+
+    @property
+    def offset(self):
+        if self.block is None:
+            return self._offset
+        return self.block.base + self._offset
+
+    @property
+    def reach(self):
+        if self.block is None:
+            return self._reach
+        return self.block.base + self._reach
+
+    @property
+    def position(self):
+        """
+        The `(line, column)` of the token, resolved from the line index of its
+        source when it is asked for.
+        """
+
+        if self.lines is None:
+            return None, None
+        return self.lines.position(self.offset)
 
     def __str__(self):
         return f"{self.token_type}: {self.lex}"
@@ -18,3 +235,67 @@ class Token:
     @property
     def is_valid(self):
         return True
+
+
+class ErrorToken(Token):
+    """
+    A run of characters that no token matches.
+    """
+
+    @property
+    def is_valid(self):
+        return False
+
+
+class TokenBuffer:
+    """
+    The tokens of a source stored by columns: the id of the type of every
+    token in `kinds`, where its lexeme starts in `offsets` and how long it is
+    in `lengths`, all `array("I")`, ids being indexes into `types`. A token
+    takes 12 bytes, and `Token` objects and lexemes are only built when they
+    are accessed, so a buffer can be handed to the parser and to
+    `evaluate_parse` like a list of tokens. The lexeme of an empty token, like
+    the end of file, is the name of its type.
+    """
+
+    def __init__(self, text: str, types: list[Terminal], lines: LineIndex = None):
+        self.text = text
+        self.types = types
+        self.lines = LineIndex(text) if lines is None else lines
+        self.kinds = array("I")
+        self.offsets = array("I")
+        self.lengths = array("I")
+
+    def append(self, kind: int, offset: int, length: int):
+        self.kinds.append(kind)
+        self.offsets.append(offset)
+        self.lengths.append(length)
+
+    def lex(self, n: int) -> str:
+        offset, length = self.offsets[n], self.lengths[n]
+        if length == 0:
+            return self.types[self.kinds[n]].name
+        return self.text[offset : offset + length]
+
+    def token_type(self, n: int) -> Terminal:
+        return self.types[self.kinds[n]]
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def __getitem__(self, n: int) -> Token:
+        token_type = self.types[self.kinds[n]]
+        kind = ErrorToken if token_type is ERROR else Token
+        return kind(self.lex(n), token_type, self.offsets[n], None, self.lines)
+
+    def __iter__(self):
+        text = self.text
+        types = self.types
+        lines = self.lines
+        for kind, offset, length in zip(self.kinds, self.offsets, self.lengths):
+            token_type = types[kind]
+            lex = text[offset : offset + length] if length else token_type.name
+            if token_type is ERROR:
+                yield ErrorToken(lex, token_type, offset, None, lines)
+            else:
+                yield Token(lex, token_type, offset, None, lines)
@@ -5,8 +5,7 @@ import sys
 
 def main(path):
     with open(path, "r") as file:
-        program = file.read()
-    pipeline(program)
+        pipeline(file)
 
 
 if __name__ == "__main__":